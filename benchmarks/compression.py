@@ -0,0 +1,131 @@
+"""响应压缩中间件基准测试
+
+用合成的重负载响应体(模拟工作流详情、区块描述、base64 快照的形状和大小)直接驱动
+CompressionMiddleware, 统计每种编码的 p50/p99 耗时、传输字节数, 以及压缩期间事件循环的最大延迟。
+
+注意: 这里衡量的只是中间件本身的压缩开销和压缩率。响应体由一个最小 ASGI 应用直接返回,
+不经过真实的路由、数据库查询和序列化, 因此 p50/p99 不是这些接口的端到端耗时;
+真实接口的耗时请参考 /metrics 中 reef_http_request_seconds 的路由直方图。
+
+在仓库根目录运行:
+    python -m benchmarks.compression [--rounds 50] [--steps 100]
+"""
+import os
+import json
+import time
+import base64
+import asyncio
+import argparse
+import statistics
+from typing import Callable, List, Tuple
+
+from reef.utlis.compression import CompressionMiddleware
+
+
+def synthetic_workflow(steps: int) -> bytes:
+    """工作流详情: data 中每个节点内嵌区块 schema"""
+    block_schema = {"properties": {f"field_{j}": {"type": "string", "title": f"Field {j}", "description": "x" * 120} for j in range(25)}}
+    nodes = [{
+        "id": f"node-{i}",
+        "position": {"x": i * 120, "y": (i % 7) * 80},
+        "data": {"block_schema": block_schema, "formData": {"name": f"step_{i}", "image": f"$steps.step_{max(0, i - 1)}.image", "confidence": 0.4}},
+    } for i in range(steps)]
+    edges = [{"id": f"edge-{i}", "source": f"node-{i}", "target": f"node-{i + 1}"} for i in range(steps - 1)]
+    return json.dumps({"id": "0" * 24, "name": "workflow", "data": {"nodes": nodes, "edges": edges}}).encode()
+
+
+def synthetic_describe(blocks: int) -> bytes:
+    """/workflows/blocks/describe/all"""
+    items = [{
+        "manifest_type_identifier": f"roboflow_core/block_{i}@v1",
+        "human_friendly_block_name": f"Block {i}",
+        "block_schema": {"properties": {f"field_{j}": {"type": "string", "description": f"描述 {j} " * 10} for j in range(30)}},
+        "outputs_manifest": [{"name": "predictions", "kind": [{"name": "object_detection_prediction"}]}],
+    } for i in range(blocks)]
+    return json.dumps({"blocks": items, "kinds_connections": {}}, ensure_ascii=False).encode()
+
+
+def synthetic_snapshot(size: int) -> bytes:
+    """相机快照: JPEG 数据本身几乎不可压缩, 只有 base64 的冗余"""
+    return json.dumps({"camera_id": "0" * 24, "image_base64": base64.b64encode(os.urandom(size)).decode()}).encode()
+
+
+def make_app(body: bytes):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body, "more_body": False})
+    return app
+
+
+async def request(app, encoding: str) -> int:
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", encoding.encode())]}
+    received = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            received.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return sum(len(chunk) for chunk in received)
+
+
+async def measure_loop_lag(stop: asyncio.Event, lags: List[float], interval: float = 0.001) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - started - interval) * 1000)
+
+
+async def run(name: str, body: bytes, encoding: str, rounds: int) -> Tuple[str, ...]:
+    app = CompressionMiddleware(make_app(body))
+    samples, lags, stop = [], [], asyncio.Event()
+    ticker = asyncio.create_task(measure_loop_lag(stop, lags))
+    size = 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        size = await request(app, encoding)
+        samples.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0)
+    stop.set()
+    await ticker
+    samples.sort()
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return (name, encoding, f"{len(body)}", f"{size}", f"{len(body) / size:.1f}x",
+            f"{statistics.median(samples):.2f}", f"{p99:.2f}", f"{max(lags, default=0):.2f}")
+
+
+async def main_async(args) -> None:
+    payloads: List[Tuple[str, Callable[[], bytes]]] = [
+        ("workflow", lambda: synthetic_workflow(args.steps)),
+        ("describe", lambda: synthetic_describe(args.blocks)),
+        ("snapshot", lambda: synthetic_snapshot(args.snapshot_kb * 1024)),
+    ]
+    encodings = ["identity", "gzip", "br"]
+    header = ("payload", "encoding", "raw_bytes", "wire_bytes", "ratio", "p50_ms", "p99_ms", "max_loop_lag_ms")
+    rows = [header]
+    for name, build in payloads:
+        body = build()
+        for encoding in encodings:
+            rows.append(await run(name, body, encoding, args.rounds))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    for row in rows:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--steps", type=int, default=100, help="工作流节点数")
+    parser.add_argument("--blocks", type=int, default=150, help="区块描述中的区块数")
+    parser.add_argument("--snapshot-kb", type=int, default=300, help="快照 JPEG 大小(KB)")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
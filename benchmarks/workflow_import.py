@@ -0,0 +1,72 @@
+"""Roboflow 工作流导入(specification -> 画布数据)基准测试
+
+在仓库根目录运行:
+    python -m benchmarks.workflow_import [--steps 100] [--rounds 200]
+
+使用合成的多步骤工作流，每个步骤引用前一个步骤的输出和若干输入参数，
+统计 build_workflow_data 的平均耗时与 p50/p99。
+"""
+import argparse
+import statistics
+import time
+
+from reef.utlis.workflow_graph import build_workflow_data
+
+
+def synthetic_specification(steps: int) -> dict:
+    inputs = [{"type": "WorkflowImage", "name": "image"}] + [
+        {"type": "WorkflowParameter", "name": f"param_{i}", "default_value": i} for i in range(5)
+    ]
+    step_list = []
+    for i in range(steps):
+        image = "$inputs.image" if i == 0 else f"$steps.step_{i - 1}.image"
+        step_list.append({
+            "type": f"roboflow_core/block_{i % 10}@v1",
+            "name": f"step_{i}",
+            "image": image,
+            "confidence": f"$inputs.param_{i % 5}",
+            "predictions": [f"$steps.step_{j}.predictions" for j in range(max(0, i - 3), i)],
+            "options": {
+                "classes": ["car", "person", "bus"],
+                "nested": {"ref": f"$steps.step_{max(0, i - 2)}.predictions", "iou": 0.5},
+            },
+        })
+    outputs = [
+        {"type": "JsonField", "name": f"output_{i}", "selector": f"$steps.step_{i}.predictions"}
+        for i in range(max(0, steps - 5), steps)
+    ]
+    return {"version": "1.0", "inputs": inputs, "steps": step_list, "outputs": outputs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    specification = synthetic_specification(args.steps)
+    blocks = {
+        f"roboflow_core/block_{i}@v1": {
+            "manifest_type_identifier": f"roboflow_core/block_{i}@v1",
+            "human_friendly_block_name": f"Block {i}",
+            "block_schema": {"properties": {f"field_{j}": {"type": "string"} for j in range(20)}},
+        }
+        for i in range(10)
+    }
+
+    samples = []
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        data = build_workflow_data(
+            specification["inputs"], specification["steps"], specification["outputs"], blocks.get
+        )
+        samples.append((time.perf_counter() - started) * 1000)
+
+    samples.sort()
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"steps={args.steps} rounds={args.rounds} nodes={len(data['nodes'])} edges={len(data['edges'])}")
+    print(f"mean={statistics.mean(samples):.3f}ms p50={statistics.median(samples):.3f}ms p99={p99:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
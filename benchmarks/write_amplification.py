@@ -0,0 +1,121 @@
+"""状态更新的写放大基准测试
+
+对比一次部署状态更新在两种写法下发送给 MongoDB 的 BSON 字节数:
+- replace: 修改属性后 save(), 整个文档替换
+- $set:    update_document() 只 $set 变化的字段和 updated_at
+
+在仓库根目录运行 (需要 pymongo 提供的 bson):
+    python -m benchmarks.write_amplification [--steps 20] [--cameras 8]
+"""
+import argparse
+from datetime import datetime
+
+import bson
+from bson import DBRef, ObjectId
+
+
+def synthetic_workflow_specification(steps: int) -> dict:
+    return {
+        "version": "v1",
+        "inputs": [{"name": "image", "type": "WorkflowImage"}] + [
+            {"name": f"param_{i}", "type": "WorkflowParameter", "default_value": i} for i in range(5)
+        ],
+        "steps": [{
+            "type": f"roboflow_core/block_{i % 10}@v1",
+            "name": f"step_{i}",
+            "image": "$inputs.image" if i == 0 else f"$steps.step_{i - 1}.image",
+            "predictions": f"$steps.step_{max(0, i - 1)}.predictions",
+            "confidence": 0.4,
+            "class_filter": ["car", "person", "bus", "truck"],
+        } for i in range(steps)],
+        "outputs": [{"type": "JsonField", "name": "result", "selector": f"$steps.step_{steps - 1}.predictions"}],
+    }
+
+
+def synthetic_deployment(steps: int, cameras: int) -> dict:
+    """与 DeploymentModel 落库格式一致的部署文档"""
+    now = datetime.now()
+    return {
+        "_id": ObjectId(),
+        "name": "deployment",
+        "description": "synthetic deployment for write amplification benchmark",
+        "gateway": DBRef("gateways", ObjectId()),
+        "cameras": [DBRef("cameras", ObjectId()) for _ in range(cameras)],
+        "workflow": DBRef("workflows", ObjectId()),
+        "workflow_md5": "0" * 32,
+        "cameras_md5": "0" * 32,
+        "pipeline_id": "pipeline-" + "0" * 24,
+        "running_status": "running",
+        "parameters": {f"param_{i}": i for i in range(5)},
+        "max_fps": 15,
+        "output_image_fields": ["image"],
+        "created_at": now,
+        "updated_at": now,
+        "workspace": DBRef("workspaces", ObjectId()),
+    }
+
+
+def synthetic_workflow(steps: int) -> dict:
+    """工作流文档, data 中的节点内嵌区块 schema, 通常是最大的文档"""
+    specification = synthetic_workflow_specification(steps)
+    block_schema = {
+        "properties": {f"field_{j}": {"type": "string", "title": f"Field {j}", "description": "x" * 120} for j in range(25)}
+    }
+    now = datetime.now()
+    return {
+        "_id": ObjectId(),
+        "name": "workflow",
+        "description": "synthetic workflow",
+        "data": {
+            "nodes": [{"id": f"node-{i}", "data": {"block_schema": block_schema, "formData": step}}
+                      for i, step in enumerate(specification["steps"])],
+            "edges": [{"source": f"node-{i}", "target": f"node-{i + 1}"} for i in range(steps - 1)],
+        },
+        "specification": specification,
+        "specification_md5": "0" * 32,
+        "created_at": now,
+        "updated_at": now,
+        "workspace": DBRef("workspaces", ObjectId()),
+        "creator": DBRef("users", ObjectId()),
+    }
+
+
+def replace_bytes(document: dict) -> int:
+    """replace_one(filter, document) 的命令体大小"""
+    return len(bson.encode({"q": {"_id": document["_id"]}, "u": document}))
+
+
+def set_bytes(document: dict, changed: dict) -> int:
+    """update_one(filter, {"$set": changed}) 的命令体大小"""
+    return len(bson.encode({"q": {"_id": document["_id"]}, "u": {"$set": changed}}))
+
+
+def report(label: str, document: dict, changed: dict) -> None:
+    before, after = replace_bytes(document), set_bytes(document, changed)
+    print(f"{label:<28} replace={before:>8}B  $set={after:>6}B  reduction={before / after:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--cameras", type=int, default=8)
+    args = parser.parse_args()
+
+    now = datetime.now()
+    deployment = synthetic_deployment(args.steps, args.cameras)
+    report("deployment running_status", deployment, {"running_status": "muted", "updated_at": now})
+
+    workflow = synthetic_workflow(args.steps)
+    report("workflow rename", workflow, {"name": "renamed", "updated_at": now})
+
+    gateway = {
+        "_id": ObjectId(), "name": "gateway", "description": "", "status": "online",
+        "ip_address": "10.0.0.1", "mac_address": "00:00:00:00:00:00", "platform": "linux",
+        "last_heartbeat": now, "created_at": now, "updated_at": now,
+        "workspace": DBRef("workspaces", ObjectId()),
+    }
+    report("gateway status", gateway, {"status": "offline", "updated_at": now})
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
 from fastapi import FastAPI, Depends, APIRouter, Request, Query, HTTPException
 from pydantic import ValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.exceptions import HTTPException as StarletteHTTPException
@@ -30,6 +30,11 @@ from reef.core.users import fastapi_users, auth_backend
 from reef.schemas.users import UserRead, UserCreate
 
 from reef.utlis.monitor import start_monitor
+from reef.utlis.snapshot import snapshot_service
+from reef.utlis.media import executors_metrics, frame_executor, media_executor
+from reef.utlis.compression import CompressionMiddleware
+from reef.utlis.instrumentation import InstrumentationMiddleware, mongo_listener, render_prometheus
+from reef.utlis.result_relay import result_relays
 
 from reef.config import settings
 from reef.exceptions import ModelException
@@ -37,10 +42,14 @@ from reef.exceptions import ModelException
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    client = AsyncIOMotorClient(settings.mongo_uri)
+    client = AsyncIOMotorClient(settings.mongo_uri, event_listeners=[mongo_listener])
     await init_beanie(database=client.get_default_database(), document_models=INIT_MODELS)
     await start_monitor()
+    await snapshot_service.start_keep_warm()
     yield
+    snapshot_service.shutdown()
+    media_executor.shutdown()
+    frame_executor.shutdown()
 
 
 app = FastAPI(
@@ -48,6 +57,7 @@ app = FastAPI(
     description="Coral Reef API",
     version="0.1.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 
@@ -59,6 +69,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 按大小阈值和类型白名单压缩响应
+app.add_middleware(CompressionMiddleware)
+# 最外层: 路由耗时直方图和 Server-Timing, 包含压缩耗时
+app.add_middleware(InstrumentationMiddleware)
 
 
 noauth_router = APIRouter()
@@ -99,24 +113,39 @@ async def root():
     return {"message": "Hello World"}
 
 
+@app.get("/metrics/media")
+async def media_metrics():
+    """媒体线程池(media/frame)的队列深度和任务耗时"""
+    return executors_metrics()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus 格式的指标: 路由耗时、Mongo 命令、外部调用、媒体线程池、结果中转"""
+    return PlainTextResponse(
+        render_prometheus(executors_metrics(), result_relays.stats()),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request, exc):
     logger.exception(f'http exception: {exc}')
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"message": str(exc.detail)}
     )
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=422,
         content={"message": str(exc)}
     )
 
 @app.exception_handler(ModelException)
 async def model_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"message": str(exc)}
     )
@@ -124,7 +153,7 @@ async def model_exception_handler(request, exc):
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     logger.exception(f"General exception: {exc}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"message": "Internal server error"}
     )
@@ -132,7 +161,7 @@ async def general_exception_handler(request, exc):
 
 @app.exception_handler(ValidationError)
 async def validation_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=422,
         content={"message": str(exc)}
     )
@@ -1,6 +1,5 @@
-from fastapi import APIRouter, HTTPException, status, Query
+from fastapi import APIRouter, HTTPException, status, Query, Request, Response
 from typing import Optional
-from copy import deepcopy
 
 from reef.core.blocks import BlockCore
 from reef.schemas import CommonResponse
@@ -9,11 +8,11 @@ from reef.schemas.blocks import (
     BlockTranslationUpdate,
     BlockTranslationResponse,
     BlockTranslationSync,
+    BlockTranslationSyncReport,
     BlockTranslationPaginatedResponse,
     PaginationParams
 )
-from reef.utlis.roboflow import get_base_blocks_describe
-from reef.models.blocks import BlockTranslation
+from reef.utlis.compression import select_encoding
 
 
 router = APIRouter(prefix="/workflows/blocks", tags=["blocks"])
@@ -84,12 +83,11 @@ async def delete_block_translation(block_id: str):
         )
 
 
-@router.post("/sync", response_model=CommonResponse)
+@router.post("/sync", response_model=BlockTranslationSyncReport)
 async def sync_block_translations(sync_data: BlockTranslationSync):
-    """同步第三方接口的区块数据"""
+    """同步第三方接口的区块数据，返回同步报告"""
     try:
-        await BlockCore.sync_block_translations(sync_data)
-        return CommonResponse(message="同步成功")
+        return await BlockCore.sync_block_translations(sync_data)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
@@ -116,31 +114,22 @@ async def toggle_block_status(block_id: str):
 
 
 @router.get("/describe/all")
-async def get_blocks_describe(disabled: bool = Query(None, description="是否禁用")):
+async def get_blocks_describe(
+    request: Request,
+    disabled: bool = Query(None, description="是否禁用"),
+):
     """获取区块描述信息，包含翻译后的 schema"""
-    # 获取所有区块翻译
-    if disabled is None:
-        blocks = await BlockTranslation.find().to_list()
-    else:
-        blocks = await BlockTranslation.find({'disabled': disabled}).to_list()
-    
-    # 创建 manifest_type_identifier 到 block_schema 的映射
-    identifier_block_mapper = {
-        block.manifest_type_identifier: block.block_schema
-        for block in blocks
-    }
-    
-    _describe_blocks = []
-    describe = await get_base_blocks_describe()
-    for block in describe['blocks']:
-        _block = deepcopy(block)
-        manifest_type_identifier = block['manifest_type_identifier']
-        if manifest_type_identifier not in identifier_block_mapper:
-            continue
-        _block['block_schema'] = identifier_block_mapper[manifest_type_identifier]
-        _describe_blocks.append(_block)
-    
-    return {
-        'blocks': _describe_blocks,
-        'kinds_connections': describe['kinds_connections']
-    }
+    payload = await BlockCore.get_blocks_describe(disabled)
+
+    encoding = select_encoding(request.headers.get("accept-encoding", ""))
+    content = {"br": payload.br, "gzip": payload.gzip}.get(encoding, payload.body)
+
+    etag = f'"{payload.etag}-{encoding}"' if encoding else f'"{payload.etag}"'
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type="application/json", headers=headers)
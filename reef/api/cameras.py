@@ -1,5 +1,10 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Response, Query
+import json
+import uuid
+import struct
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import List, Literal, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Response, Query, Request
 from fastapi.responses import StreamingResponse
 import cv2
 
@@ -16,6 +21,7 @@ from reef.schemas.cameras import (
     CameraWebRTCStreamResponse
 )
 from reef.schemas.deployments import DeploymentResponse
+from reef.utlis.snapshot import Thumbnail
 from reef.api._depends import check_user_has_workspace_permission, get_camera, get_gateway, get_workspace
 
 
@@ -89,6 +95,106 @@ async def get_camera_snapshot(
 
 
 
+def _thumbnail_error(error: Exception) -> str:
+    return getattr(error, "message", None) or str(error)
+
+
+def _pack_thumbnails_binary(camera_ids: List[str], thumbnails: List[Union[Thumbnail, Exception]]) -> bytes:
+    """紧凑二进制容器: 4字节大端头长度 + JSON索引 + 依次拼接的JPEG, offset 相对于JPEG数据区起点"""
+    index, chunks, offset = [], [], 0
+    for camera_id, thumbnail in zip(camera_ids, thumbnails):
+        if isinstance(thumbnail, Exception):
+            index.append({"camera_id": camera_id, "error": _thumbnail_error(thumbnail)})
+            continue
+        index.append({
+            "camera_id": camera_id,
+            "offset": offset,
+            "length": len(thumbnail.image),
+            "width": thumbnail.width,
+            "height": thumbnail.height,
+            "etag": thumbnail.etag,
+        })
+        chunks.append(thumbnail.image)
+        offset += len(thumbnail.image)
+    header = json.dumps({"items": index}, separators=(",", ":")).encode("utf-8")
+    return b"".join([struct.pack(">I", len(header)), header, *chunks])
+
+
+def _pack_thumbnails_multipart(
+    camera_ids: List[str], thumbnails: List[Union[Thumbnail, Exception]], boundary: str
+) -> bytes:
+    """multipart/mixed: 每个相机一个 part, 失败的相机返回 JSON 错误 part"""
+    parts = []
+    for camera_id, thumbnail in zip(camera_ids, thumbnails):
+        if isinstance(thumbnail, Exception):
+            headers = f"Content-Type: application/json\r\nContent-ID: <{camera_id}>\r\n"
+            body = json.dumps({"camera_id": camera_id, "error": _thumbnail_error(thumbnail)}).encode("utf-8")
+        else:
+            headers = (
+                f"Content-Type: image/jpeg\r\nContent-ID: <{camera_id}>\r\n"
+                f"ETag: \"{thumbnail.etag}\"\r\n"
+                f"X-Image-Width: {thumbnail.width}\r\nX-Image-Height: {thumbnail.height}\r\n"
+            )
+            body = thumbnail.image
+        parts.append(f"--{boundary}\r\n{headers}\r\n".encode("utf-8") + body + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(parts)
+
+
+def _is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@router.get("/thumbnails")
+async def get_camera_thumbnails(
+    request: Request,
+    camera_ids: List[str] = Query(..., description="摄像头ID列表"),
+    width: int = Query(320, ge=16, le=1920, description="缩略图宽度, 向上取整到固定档位"),
+    format: Literal["binary", "multipart"] = Query("binary", description="返回格式"),
+    workspace: WorkspaceModel = Depends(get_workspace),
+) -> Response:
+    """批量获取摄像头缩略图, 以二进制容器或 multipart 返回 JPEG, 支持 ETag/Last-Modified 协商缓存"""
+    if len(camera_ids) > 100:
+        raise HTTPException(status_code=400, detail="单次最多获取100个摄像头的缩略图")
+
+    thumbnails = await CameraCore.get_thumbnails(workspace=workspace, camera_ids=camera_ids, width=width)
+
+    item_tags = [
+        "error" if isinstance(thumbnail, Exception) else thumbnail.etag
+        for thumbnail in thumbnails
+    ]
+    etag = '"' + hashlib.md5(f"{format}:{width}:{','.join(camera_ids)}:{','.join(item_tags)}".encode("utf-8")).hexdigest() + '"'
+    last_modified = max(
+        [thumbnail.taken_at for thumbnail in thumbnails if not isinstance(thumbnail, Exception)],
+        default=0
+    )
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+
+    if _is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    if format == "multipart":
+        boundary = uuid.uuid4().hex
+        content = _pack_thumbnails_multipart(camera_ids, thumbnails, boundary)
+        media_type = f"multipart/mixed; boundary={boundary}"
+    else:
+        content = _pack_thumbnails_binary(camera_ids, thumbnails)
+        media_type = "application/octet-stream"
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
 @router.get("/{camera_id}/video-info", response_model=CameraVideoInfo)
 async def get_camera_video_info(
     camera: CameraModel = Depends(get_camera),
@@ -99,6 +205,16 @@ async def get_camera_video_info(
     return CameraVideoInfo(**video_info)
 
 
+@router.post("/{camera_id}/video-info/refresh", response_model=CameraVideoInfo)
+async def refresh_camera_video_info(
+    camera: CameraModel = Depends(get_camera),
+) -> CameraVideoInfo:
+    """重新探测摄像头视频信息"""
+    camera_core = CameraCore(camera=camera)
+    video_info = await camera_core.refresh_video_info()
+    return CameraVideoInfo(**video_info)
+
+
 @router.post("/{camera_id}/webrtc-stream", response_model=CameraWebRTCStreamResponse)
 async def create_camera_webrtc_stream_via_pipeline(
     webrtc_request: CameraWebRTCStreamRequest,
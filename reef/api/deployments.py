@@ -1,6 +1,8 @@
+import uuid
 import asyncio
-from typing import List
-from fastapi import APIRouter, Depends, Query
+from typing import Any, Dict, List, Literal, Optional
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
 from reef.core.deployments import DeploymentCore
 from reef.models import (
@@ -15,8 +17,13 @@ from reef.schemas.deployments import (
     DeploymentUpdate,
     DeploymentDiffResponse,
     DeploymentOfferRequest,
-    WebRTCOffer
+    WebRTCOffer,
+    DeploymentBulkRequest,
+    BulkOperationResult
 )
+from reef.exceptions import ObjectNotFoundError
+from reef.utlis import serializer
+from reef.utlis.result_relay import ImageMode
 from reef.api._depends import (
     check_user_has_workspace_permission,
     get_deployment,
@@ -27,6 +34,11 @@ from reef.api._depends import (
 )
 
 
+# SSE 心跳间隔(秒)
+SSE_HEARTBEAT = 15
+# 结果图像在浏览器中的缓存时间(秒), 帧按序号寻址, 内容不会变化
+FRAME_MAX_AGE = 60
+
 router = APIRouter(
     prefix="/workspaces/{workspace_id}/deployments",
     tags=["deployments"],
@@ -61,6 +73,26 @@ async def create_deployment(
     return DeploymentResponse.db_to_schema(deployment_core.deployment)
 
 
+@router.post("/bulk", response_model=BulkOperationResult)
+async def bulk_deployments(
+    bulk_request: DeploymentBulkRequest,
+    workspace: WorkspaceModel = Depends(get_workspace),
+) -> BulkOperationResult:
+    """批量暂停/恢复/重启/删除部署, 返回逐项结果"""
+    deployments = await DeploymentCore.find_deployments(
+        workspace=workspace,
+        deployment_ids=bulk_request.deployment_ids,
+        gateway_id=bulk_request.gateway_id,
+        workflow_id=bulk_request.workflow_id,
+        running_status=bulk_request.running_status
+    )
+    return await DeploymentCore.bulk_operate(
+        action=bulk_request.action,
+        deployments=deployments,
+        requested_ids=bulk_request.deployment_ids
+    )
+
+
 @router.put("/{deployment_id}", response_model=CommonResponse)
 async def update_deployment(
     deployment_data: DeploymentUpdate,
@@ -91,12 +123,102 @@ async def get_deployment_status(
     return await deployment_core.get_status()
 
 
+async def _pack_results_multipart(
+    deployment_core: DeploymentCore, results: Dict[str, Any], max_width: Optional[int], boundary: str
+) -> bytes:
+    """multipart/mixed: 第一个 part 为 JSON 结果(图像为帧引用), 之后每个图像一个 JPEG part, Content-ID 与帧引用对应"""
+    frames = [
+        output[name]["frame"]
+        for output in results["outputs"]
+        for name, value in output.items()
+        if isinstance(value, dict) and value.get("type") == "frame_ref"
+    ]
+    parts = [f"--{boundary}\r\nContent-Type: application/json\r\n\r\n".encode("utf-8") + serializer.dumps(results) + b"\r\n"]
+    for frame in frames:
+        epoch, seq, name = frame.split("/", 2)
+        try:
+            image = await deployment_core.get_result_frame(epoch, int(seq), name, max_width)
+        except ObjectNotFoundError:
+            # 打包期间被挤出缓冲区
+            continue
+        headers = f"Content-Type: image/jpeg\r\nContent-ID: <{frame}>\r\n"
+        parts.append(f"--{boundary}\r\n{headers}\r\n".encode("utf-8") + image + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(parts)
+
+
 @router.get("/{deployment_id}/results")
 async def get_deployment_results(
     deployment: DeploymentModel = Depends(get_deployment),
+    since: Optional[int] = Query(None, ge=0, description="返回序号大于 since 的结果, 为空时返回最新一条"),
+    epoch: Optional[str] = Query(None, description="上次响应中的 epoch, 与当前不一致时忽略 since 返回最新一条"),
+    exclude_fields: Optional[List[str]] = Query(None, description="不返回的输出字段"),
+    image_mode: ImageMode = Query("inline", description="图像字段返回方式: inline 内嵌 base64, ref 帧引用, none 不返回"),
+    format: Literal["json", "multipart"] = Query("json", description="返回格式, multipart 时图像以二进制 part 返回"),
+    max_width: Optional[int] = Query(None, ge=16, le=3840, description="multipart 图像的最大宽度, 用于预览"),
+) -> Response:
+    """获取推理结果, JSON 部分直接序列化为字节, 不经过通用编码器"""
+    deployment_core = DeploymentCore(deployment=deployment)
+    if format == "multipart":
+        results = await deployment_core.get_results(since=since, exclude_fields=exclude_fields, image_mode="ref", epoch=epoch)
+        boundary = uuid.uuid4().hex
+        body = await _pack_results_multipart(deployment_core, results, max_width, boundary)
+        return Response(content=body, media_type=f"multipart/mixed; boundary={boundary}")
+    results = await deployment_core.get_results(since=since, exclude_fields=exclude_fields, image_mode=image_mode, epoch=epoch)
+    return Response(content=serializer.dumps(results), media_type="application/json")
+
+
+@router.get("/{deployment_id}/results/frames/{epoch}/{seq}/{field}")
+async def get_deployment_result_frame(
+    epoch: str,
+    seq: int,
+    field: str,
+    deployment: DeploymentModel = Depends(get_deployment),
+    max_width: Optional[int] = Query(None, ge=16, le=3840, description="最大宽度, 指定时返回缩小的预览图"),
+) -> Response:
+    """按帧引用获取结果图像(JPEG), 结果被挤出中转缓冲区后返回 404"""
+    deployment_core = DeploymentCore(deployment=deployment)
+    image = await deployment_core.get_result_frame(epoch, seq, field, max_width)
+    return Response(
+        content=image,
+        media_type="image/jpeg",
+        headers={"Cache-Control": f"private, max-age={FRAME_MAX_AGE}, immutable"}
+    )
+
+
+@router.get("/{deployment_id}/results/stream")
+async def stream_deployment_results(
+    request: Request,
+    deployment: DeploymentModel = Depends(get_deployment),
+    exclude_fields: Optional[List[str]] = Query(None, description="不推送的输出字段"),
+    image_mode: ImageMode = Query("inline", description="图像字段返回方式: inline 内嵌 base64, ref 帧引用, none 不返回"),
 ):
+    """以 SSE 推送推理结果, 支持 Last-Event-ID 断点续传"""
     deployment_core = DeploymentCore(deployment=deployment)
-    return await deployment_core.get_results()
+    relay = deployment_core.get_result_relay(exclude_fields)
+    excludes = frozenset(exclude_fields or [])
+    # 事件 id 为 "{epoch}:{seq}", epoch 不一致(序号已重置)时从当前位置开始推送
+    epoch, _, last_id = (request.headers.get("last-event-id") or "").rpartition(":")
+    seq = int(last_id) if last_id.isdigit() and epoch == relay.epoch else relay.last_seq
+    seq = min(seq, relay.last_seq)
+
+    async def events():
+        nonlocal seq
+        while not await request.is_disconnected():
+            relay.touch(excludes)
+            if not await relay.wait(seq, timeout=SSE_HEARTBEAT):
+                # 心跳, 防止代理断开空闲连接
+                yield b": keep-alive\n\n"
+                continue
+            for item in relay.since(seq, excludes, image_mode):
+                seq = item["seq"]
+                yield b"id: %s:%d\ndata: %b\n\n" % (relay.epoch.encode(), seq, serializer.dumps(item))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/{deployment_id}/metrics")
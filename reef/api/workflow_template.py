@@ -5,7 +5,10 @@ from reef.models.workspaces import WorkspaceModel
 from reef.core.workflow_template import WorkflowTemplate
 from reef.schemas import CommonResponse, PaginationResponse, PaginationParams
 from reef.schemas.workflow_template import (
-    TemplateResponse
+    TemplateResponse,
+    TemplateCursorResponse,
+    TemplateSort,
+    PopularTemplateResponse
 )
 from reef.schemas.workflow_template import WorkflowSync
 from reef.models import UserModel, WorkflowTemplateModel
@@ -24,7 +27,8 @@ async def sync_template(
         workflow_id=sync_data.workflow_id,
         creator=user,
         project_id=sync_data.project_id,
-        api_key=sync_data.api_key
+        api_key=sync_data.api_key,
+        version=sync_data.version
     )
     return CommonResponse(message="模板同步成功")
 
@@ -47,6 +51,35 @@ async def list_templates(
         sort_desc=sort_desc
     )
 
+@router.get("/gallery", response_model=TemplateCursorResponse)
+async def search_templates(
+    q: Optional[str] = Query(None, min_length=1, max_length=100, description="搜索关键字(名称/标签/描述)"),
+    tags: Optional[List[str]] = Query(None, description="标签, 需全部匹配"),
+    mine: bool = Query(False, description="只看我创建的模板, 否则只看公开模板"),
+    sort: TemplateSort = Query(TemplateSort.USAGE, description="排序方式"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    limit: int = Query(20, ge=1, le=100, description="每页数量"),
+    user: UserModel = Depends(current_user)
+):
+    """模板库: 搜索、标签过滤、按使用次数或创建时间排序, 游标分页"""
+    return await WorkflowTemplate.search_templates(
+        user=user,
+        query=q,
+        tags=tags,
+        mine=mine,
+        sort=sort,
+        cursor=cursor,
+        limit=limit
+    )
+
+@router.get("/popular", response_model=List[PopularTemplateResponse])
+async def popular_templates(
+    days: int = Query(7, ge=1, le=90, description="统计最近天数"),
+    limit: int = Query(20, ge=1, le=100, description="返回数量"),
+):
+    """按最近复制次数排行的公开模板"""
+    return await WorkflowTemplate.popular_templates(days=days, limit=limit)
+
 @router.get("/{template_id}", response_model=TemplateResponse)
 async def get_template_detail(
     template: WorkflowTemplateModel = Depends(get_template_with_user_check),
@@ -1,8 +1,9 @@
-from typing import List
-from fastapi import APIRouter, Depends, Query
+from typing import List, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
 from reef.core.workflows import WorkflowCore
 from reef.core.workflow_template import WorkflowTemplate
+from reef.core.deployments import workflow_rollout
 from reef.models import WorkspaceModel, WorkflowModel, UserModel
 from reef.schemas import CommonResponse
 from reef.schemas.workflows import (
@@ -10,30 +11,60 @@ from reef.schemas.workflows import (
     WorkflowResponse,
     WorkflowUpdate,
     WorkflowRename,
+    WorkflowSummaryResponse,
 )
 from reef.schemas.workflow_template import TemplatePublish
+from reef.schemas.deployments import RolloutRequest, RolloutProgress
 from reef.exceptions import AuthenticationError
+from reef.utlis.serializer import SerializedCache, is_not_modified, payload_response
 from reef.api._depends import check_user_has_workspace_permission, get_workflow, get_workspace, current_user
 
+# 工作流详情的预序列化缓存, 按 (工作流ID, ETag) 寻址, 更新后旧条目自然失效
+workflow_payloads = SerializedCache()
+
 router = APIRouter(
     prefix="/workspaces/{workspace_id}/workflows",
     tags=["workflows"],
     dependencies=[Depends(check_user_has_workspace_permission)]
 )
 
-@router.get("/", response_model=List[WorkflowResponse])
+@router.get("/", response_model=Union[List[WorkflowSummaryResponse], List[WorkflowResponse]])
 async def list_workflows(
+    summary: bool = Query(False, description="只返回摘要(不含 data/specification)"),
     workspace: WorkspaceModel = Depends(get_workspace)
-) -> List[WorkflowResponse]:
+) -> Union[List[WorkflowSummaryResponse], List[WorkflowResponse]]:
+    if summary:
+        summaries = await WorkflowCore.get_workspace_workflow_summaries(workspace=workspace)
+        return [WorkflowSummaryResponse.db_to_schema(s) for s in summaries]
     workflows = await WorkflowCore.get_workspace_workflows(workspace=workspace)
     return [WorkflowResponse.db_to_schema(w) for w in workflows]
 
 
 @router.get("/{workflow_id}", response_model=WorkflowResponse)
 async def get_workflow_detail(
-    workflow: WorkflowModel = Depends(get_workflow)
-) -> WorkflowResponse:
-    return WorkflowResponse.db_to_schema(workflow)
+    workflow_id: str,
+    request: Request,
+):
+    """获取工作流详情
+
+    先按投影读取 ETag: If-None-Match 命中时返回 304, 预序列化缓存命中时直接返回字节,
+    两种情况都不加载 data 和关联文档。
+    """
+    summary = await WorkflowCore.get_workflow_summary(workflow_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="工作流不存在")
+    key = (workflow_id, summary.etag)
+    payload = workflow_payloads.get(key)
+    if payload is None:
+        if is_not_modified(request, f'"{summary.etag}"'):
+            return Response(status_code=304, headers={"ETag": f'"{summary.etag}"'})
+        workflow = await get_workflow(workflow_id)
+        payload = workflow_payloads.put(
+            (workflow_id, workflow.etag),
+            WorkflowResponse.db_to_schema(workflow).model_dump(mode="json"),
+            etag=workflow.etag
+        )
+    return payload_response(request, payload)
 
 
 @router.post("/", response_model=WorkflowResponse)
@@ -97,3 +128,21 @@ async def publish_template(
         is_public=template_data.is_public
     )
     return CommonResponse(message="模板发布成功")
+
+
+@router.post("/{workflow_id}/rollout", response_model=RolloutProgress)
+async def rollout_workflow(
+    rollout_request: RolloutRequest,
+    workflow: WorkflowModel = Depends(get_workflow),
+) -> RolloutProgress:
+    """分批重启配置落后于当前工作流的所有部署"""
+    return await workflow_rollout.start(workflow, rollout_request)
+
+
+@router.get("/{workflow_id}/rollout/{rollout_id}", response_model=RolloutProgress)
+async def get_rollout_progress(workflow_id: str, rollout_id: str) -> RolloutProgress:
+    """查询分批重启进度"""
+    progress = workflow_rollout.get(rollout_id)
+    if progress is None or progress.workflow_id != workflow_id:
+        raise HTTPException(status_code=404, detail="重启任务不存在")
+    return progress
@@ -1,11 +1,85 @@
-from typing import List, Optional, Dict
+import gzip
+import time
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Tuple
 from datetime import datetime
 import requests
+import brotli
 from asyncer import asyncify
+from loguru import logger
+from pymongo import InsertOne, UpdateOne
 
-from reef.models.blocks import BlockTranslation, Language
+from reef.models.blocks import BlockTranslation, Language, block_translation_cache, schema_properties_hash
 from reef.schemas.blocks import (BlockTranslationCreate, BlockTranslationUpdate, BlockTranslationSync,
-    PaginationParams, BlockTranslationPaginatedResponse, BlockTranslationResponse)
+    PaginationParams, BlockTranslationPaginatedResponse, BlockTranslationResponse, BlockTranslationSyncReport)
+from reef.utlis import serializer
+from reef.utlis.roboflow import get_base_blocks_describe
+
+
+@dataclass
+class DescribePayload:
+    """预序列化、预压缩的区块描述"""
+    etag: str
+    body: bytes
+    gzip: bytes
+    br: bytes
+
+
+def _build_describe_payload(describe: Dict, identifier_block_mapper: Dict[str, Dict]) -> DescribePayload:
+    """合并翻译后的 schema 并序列化压缩 (CPU 密集，在线程中执行)"""
+    describe_blocks = [
+        {**block, 'block_schema': identifier_block_mapper[block['manifest_type_identifier']]}
+        for block in describe['blocks']
+        if block['manifest_type_identifier'] in identifier_block_mapper
+    ]
+    body = serializer.dumps({'blocks': describe_blocks, 'kinds_connections': describe['kinds_connections']})
+    return DescribePayload(
+        etag=hashlib.md5(body).hexdigest(),
+        body=body,
+        gzip=gzip.compress(body, compresslevel=6),
+        br=brotli.compress(body, quality=5),
+    )
+
+
+class BlockDescribeCache:
+    """按 (翻译版本, disabled 过滤) 缓存合并后的区块描述, 翻译或基础 describe 变化时重建"""
+
+    def __init__(self):
+        self._entries: Dict[Optional[bool], Tuple[int, Dict, DescribePayload]] = {}
+        self._inflight: Dict[Tuple[int, Optional[bool]], asyncio.Future] = {}
+
+    async def get(self, disabled: Optional[bool] = None) -> DescribePayload:
+        version = block_translation_cache.version
+        describe = await get_base_blocks_describe()
+        entry = self._entries.get(disabled)
+        if entry and entry[0] == version and entry[1] is describe:
+            return entry[2]
+
+        key = (version, disabled)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._build(version, describe, disabled))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _build(self, version: int, describe: Dict, disabled: Optional[bool]) -> DescribePayload:
+        query = {} if disabled is None else {'disabled': disabled}
+        blocks = await BlockTranslation.find(query).to_list()
+        identifier_block_mapper = {
+            block.manifest_type_identifier: block.block_schema
+            for block in blocks
+        }
+        payload = await asyncify(_build_describe_payload)(describe, identifier_block_mapper)
+        # 构建期间翻译发生变化时不缓存
+        if version == block_translation_cache.version:
+            self._entries[disabled] = (version, describe, payload)
+        return payload
+
+
+describe_cache = BlockDescribeCache()
 
 class BlockCore:
     @staticmethod
@@ -24,6 +98,7 @@ class BlockCore:
             updated_at=datetime.now()
         )
         await block_doc.insert()
+        block_translation_cache.invalidate()
         return block_doc
 
     @staticmethod
@@ -105,6 +180,7 @@ class BlockCore:
         update_data["updated_at"] = datetime.now()
         
         await existing.update({"$set": update_data})
+        block_translation_cache.invalidate()
         return await BlockTranslation.get(block_id)
 
     @staticmethod
@@ -114,12 +190,13 @@ class BlockCore:
         if not existing:
             return False
         await existing.delete()
+        block_translation_cache.invalidate()
         return True
 
     @staticmethod
     def _compare_and_update_properties(existing_props: dict, new_props: dict) -> tuple[dict, bool]:
         """比较并更新属性，返回更新后的属性和是否有变化"""
-        updated_props = existing_props.copy()
+        updated_props = dict(existing_props)
         has_changes = False
 
         for prop_name, new_prop_value in new_props.items():
@@ -129,25 +206,32 @@ class BlockCore:
                 has_changes = True
                 continue
 
-            # 处理已存在的属性
+            # 处理已存在的属性, 只收集变化的字段, 不修改已有文档中的嵌套字典
             existing_prop = existing_props[prop_name]
-            for field_name, field_value in new_prop_value.items():
-                # 检查字段是否有变化
-                if field_name not in existing_prop or existing_prop[field_name] != field_value:
-                    updated_props[prop_name].update({field_name: field_value})
-                    has_changes = True
+            changed = {
+                field_name: field_value for field_name, field_value in new_prop_value.items()
+                if field_name not in existing_prop or existing_prop[field_name] != field_value
+            }
+            if changed:
+                updated_props[prop_name] = {**existing_prop, **changed}
+                has_changes = True
 
         return updated_props, has_changes
 
     @staticmethod
-    async def sync_block_translations(sync_data: BlockTranslationSync) -> List[BlockTranslation]:
-        """同步第三方接口的区块数据"""
-        response = await asyncify(requests.post)(sync_data.source_url)
+    async def sync_block_translations(sync_data: BlockTranslationSync) -> BlockTranslationSyncReport:
+        """同步第三方接口的区块数据
+
+        在内存中计算差异后通过一次无序 bulk_write 写入, dry_run 时只返回差异统计不写库。
+        """
+        started = time.perf_counter()
+        response = await asyncify(requests.post)(sync_data.source_url, timeout=60)
         
         if response.status_code != 200:
             raise ValueError("Failed to fetch data from source")
         
-        source_blocks = response.json()['blocks']
+        source_blocks = (await asyncify(response.json)())['blocks']
+        fetched = time.perf_counter()
         current_time = datetime.now()
         
         # 获取所有已存在的区块
@@ -157,57 +241,83 @@ class BlockCore:
         }).to_list()
         
         existing_map = {block.manifest_type_identifier: block for block in existing_blocks}
-        blocks_to_insert = []
+        operations = []
+        inserted, updated, unchanged = 0, 0, 0
         
         for block in source_blocks:
             if block["manifest_type_identifier"] in existing_map:
                 # 更新已存在的区块
                 existing = existing_map[block["manifest_type_identifier"]]
                 
-                # 比较并更新属性
-                existing_props = existing.block_schema.get("properties", {})
                 new_props = block["block_schema"].get("properties", {})
-                updated_props, props_changed = BlockCore._compare_and_update_properties(
-                    existing_props, new_props
-                )
+                source_hash = schema_properties_hash(new_props)
+                compatibility = block.get("execution_engine_compatibility", '')
+                other_fields_changed = existing.execution_engine_compatibility != compatibility
 
-                other_fields_changed = existing.execution_engine_compatibility != block.get("execution_engine_compatibility", '')
+                # 源数据结构哈希未变化时直接跳过, 只有哈希不同才逐字段合并
+                props_changed = False
+                if existing.source_hash != source_hash:
+                    updated_props, props_changed = BlockCore._compare_and_update_properties(
+                        existing.block_schema.get("properties", {}), new_props
+                    )
 
                 # 如果有任何变化，更新区块
                 if props_changed or other_fields_changed:
                     update_data = {
                         "human_friendly_block_name": block["human_friendly_block_name"],
-                        "block_schema": {
-                            **block["block_schema"],
-                            "properties": updated_props
-                        },
-                        "execution_engine_compatibility": block.get("execution_engine_compatibility", ''),
+                        "execution_engine_compatibility": compatibility,
+                        "source_hash": source_hash,
                         "sync_at": current_time
                     }
-                    # 使用 find_one(...).update 进行更新
-                    await BlockTranslation.find_one(
-                        BlockTranslation.id == existing.id
-                    ).update({"$set": update_data})
-                    
+                    if props_changed:
+                        update_data["block_schema"] = {**block["block_schema"], "properties": updated_props}
+                    operations.append(UpdateOne({"_id": existing.id}, {"$set": update_data}))
+                    updated += 1
+                elif existing.source_hash != source_hash:
+                    # 内容一致但缺少哈希(历史数据), 只补写哈希
+                    operations.append(UpdateOne({"_id": existing.id}, {"$set": {"source_hash": source_hash}}))
+                    unchanged += 1
+                else:
+                    unchanged += 1
             else:
                 # 创建新区块
-                block_doc = BlockTranslation(
-                    language=sync_data.language,
-                    human_friendly_block_name=block["human_friendly_block_name"],
-                    block_schema=block["block_schema"],
-                    manifest_type_identifier=block["manifest_type_identifier"],
-                    execution_engine_compatibility=block.get("execution_engine_compatibility", ''),
-                    disabled=True,
-                    created_at=current_time,
-                    updated_at=current_time,
-                    sync_at=current_time
-                )
-                blocks_to_insert.append(block_doc)
+                operations.append(InsertOne({
+                    "language": sync_data.language.value,
+                    "human_friendly_block_name": block["human_friendly_block_name"],
+                    "block_schema": block["block_schema"],
+                    "manifest_type_identifier": block["manifest_type_identifier"],
+                    "execution_engine_compatibility": block.get("execution_engine_compatibility", ''),
+                    "source_hash": schema_properties_hash(block["block_schema"].get("properties", {})),
+                    "disabled": True,
+                    "created_at": current_time,
+                    "updated_at": current_time,
+                    "sync_at": current_time
+                }))
+                inserted += 1
+        diffed = time.perf_counter()
         
-        # 批量插入新区块
-        if blocks_to_insert:
-            await BlockTranslation.insert_many(blocks_to_insert)
-        return True
+        if operations and not sync_data.dry_run:
+            await BlockTranslation.get_motor_collection().bulk_write(operations, ordered=False)
+            block_translation_cache.invalidate()
+        written = time.perf_counter()
+
+        report = BlockTranslationSyncReport(
+            total=len(source_blocks),
+            inserted=inserted,
+            updated=updated,
+            unchanged=unchanged,
+            dry_run=sync_data.dry_run,
+            fetch_seconds=round(fetched - started, 3),
+            diff_seconds=round(diffed - fetched, 3),
+            write_seconds=round(written - diffed, 3),
+        )
+        logger.info(f'同步区块翻译: {report.model_dump()}')
+        return report
+
+    @staticmethod
+    async def get_blocks_describe(disabled: Optional[bool] = None) -> DescribePayload:
+        """获取区块描述信息，包含翻译后的 schema"""
+        return await describe_cache.get(disabled)
 
     @staticmethod
     async def toggle_block_status(block_id: str) -> Optional[BlockTranslation]:
@@ -223,4 +333,5 @@ class BlockCore:
         }
         
         await existing.update({"$set": update_data})
+        block_translation_cache.invalidate()
         return await BlockTranslation.get(block_id)
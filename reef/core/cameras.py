@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Any, AsyncGenerator
+from typing import List, Optional, Dict, Any, AsyncGenerator, Union
 from datetime import datetime
 import asyncio
 import threading
@@ -8,18 +8,24 @@ import base64
 import numpy as np
 
 from loguru import logger
+from beanie import PydanticObjectId
 from beanie.odm.operators.find.array import ElemMatch
 
 from reef.models import (
     CameraModel,
+    CameraType,
     WorkspaceModel,
     GatewayModel,
     DeploymentModel
 )
 from reef.exceptions import (
-    AssociatedObjectExistsError
+    AssociatedObjectExistsError,
+    ObjectNotFoundError,
+    ValidationError
 )
 from reef.schemas.cameras import CameraWebRTCStreamRequest
+from reef.utlis.snapshot import snapshot_service, Thumbnail
+from reef.utlis._utils import spawn_background, update_document
 
 
 class CameraCore:
@@ -52,17 +58,28 @@ class CameraCore:
             created_at=datetime.now(),
             updated_at=datetime.now()
         )
+        if camera.keep_warm and not snapshot_service.supports_warm(camera):
+            raise ValidationError("文件视频和网关 USB 摄像头不支持常驻取流")
         await camera.insert()
+        if camera.type == CameraType.FILE:
+            # 后台探测文件视频信息并持久化，部署时直接使用
+            spawn_background(camera.refresh_video_probe())
+        if camera.keep_warm:
+            snapshot_service.pin(camera)
         logger.info(f'Created camera: {camera.id}')
         return cls(camera=camera)
 
     async def update_camera(self, camera_data: dict) -> None:
         """Update an existing camera."""
-        for key, value in camera_data.items():
-            setattr(self.camera, key, value)
-        
-        self.camera.updated_at = datetime.now()
-        await self.camera.save()
+        if camera_data.get('keep_warm') and not snapshot_service.supports_warm(self.camera):
+            raise ValidationError("文件视频和网关 USB 摄像头不支持常驻取流")
+        await update_document(self.camera, camera_data)
+
+        if 'keep_warm' in camera_data:
+            if self.camera.keep_warm:
+                snapshot_service.pin(self.camera)
+            else:
+                snapshot_service.unpin(str(self.camera.id))
 
     async def delete_camera(self) -> None:
         """Delete a camera and update related entities."""
@@ -77,6 +94,8 @@ class CameraCore:
                 "无法删除存在部署服务的相机!"
             )
         
+        snapshot_service.unpin(str(self.camera.id))
+        snapshot_service.invalidate(str(self.camera.id))
         await self.camera.delete()
         logger.info(f'删除相机: {self.camera.id}')
     
@@ -84,10 +103,43 @@ class CameraCore:
         """Fetch a snapshot from camera."""
         return await self.camera.fetch_snapshot()
     
+    @classmethod
+    async def get_thumbnails(
+        cls,
+        workspace: WorkspaceModel,
+        camera_ids: List[str],
+        width: int
+    ) -> List[Union[Thumbnail, Exception]]:
+        """批量获取工作空间内相机的缩略图，单个相机失败时返回对应异常"""
+        object_ids = [PydanticObjectId(camera_id) for camera_id in camera_ids if PydanticObjectId.is_valid(camera_id)]
+        cameras = await CameraModel.find(
+            {"_id": {"$in": object_ids}},
+            CameraModel.workspace.id == workspace.id,
+            fetch_links=True
+        ).to_list()
+        camera_map = {str(camera.id): camera for camera in cameras}
+
+        async def _get_thumbnail(camera_id: str) -> Thumbnail:
+            camera = camera_map.get(camera_id)
+            if camera is None:
+                raise ObjectNotFoundError("摄像头不存在")
+            return await snapshot_service.get_thumbnail(camera, width)
+
+        return await asyncio.gather(
+            *[_get_thumbnail(camera_id) for camera_id in camera_ids],
+            return_exceptions=True
+        )
+
     async def get_video_info(self) -> dict:
         """Get video information from camera."""
         return await self.camera.get_video_info()
 
+    async def refresh_video_info(self) -> dict:
+        """重新探测视频信息，文件视频会强制刷新持久化的探测结果"""
+        if self.camera.type == CameraType.FILE:
+            await self.camera.refresh_video_probe(force=True)
+        return await self.camera.get_video_info()
+
     async def get_deployments(self) -> List[DeploymentModel]:
         """Get all deployments using this camera."""
         return await DeploymentModel.find(
@@ -1,8 +1,13 @@
+import time
+import uuid
+import base64
 import asyncio
+from datetime import datetime
 from typing import List, Dict, Any, Optional
 import hashlib
 
 from loguru import logger
+from beanie import PydanticObjectId
 
 from reef.models import (
     DeploymentModel,
@@ -13,9 +18,26 @@ from reef.models import (
     GatewayStatus,
     OperationStatus
 )
-from reef.exceptions import ObjectNotFoundError, InvalidStateError
+from reef.exceptions import ObjectNotFoundError, InvalidStateError, ValidationError
 from reef.models.events import EventType
 from reef.core.events import EventLogger
+from reef.config import settings
+from reef.utlis.media import media_executor
+from reef.utlis._utils import spawn_background
+from reef.utlis.snapshot import resize_jpeg
+from reef.utlis.result_relay import ImageMode, RelayItem, ResultRelay, result_relays
+from reef.schemas.deployments import (BulkAction, BulkItemResult, BulkOperationResult,
+    RolloutRequest, RolloutProgress, RolloutStatus)
+
+# 读取结果时没有新结果的最长等待时间(秒)
+RESULT_WAIT_TIMEOUT = settings.get('result_wait_timeout', 1)
+# 批量操作时同一网关上的最大并发数
+BULK_GATEWAY_CONCURRENCY = settings.get('bulk_gateway_concurrency', 4)
+# 批量暂停/恢复成功后统一写入的状态
+BULK_STATUS = {
+    BulkAction.PAUSE: OperationStatus.MUTED,
+    BulkAction.RESUME: OperationStatus.RUNNING,
+}
 
 
 async def validate_gateway(gateway: GatewayModel) -> None:
@@ -83,8 +105,10 @@ class DeploymentCore:
         max_fps: Optional[int] = None
     ) -> 'DeploymentCore':
         """Create a new deployment"""
+        started = time.perf_counter()
         await validate_gateway(gateway)
         await validate_cameras(cameras, gateway)
+        validate_seconds = round(time.perf_counter() - started, 3)
 
         # 获取工作流输出图像字段
         output_image_fields = await workflow.get_output_image_fields()
@@ -114,7 +138,8 @@ class DeploymentCore:
             details={
                 "name": name,
                 "workflow_id": str(workflow.id),
-                "camera_ids": [str(c.id) for c in cameras]
+                "camera_ids": [str(c.id) for c in cameras],
+                "timings": {"validate": validate_seconds, **deployment.provision_timings, "total": round(time.perf_counter() - started, 3)}
             }
         )
         return cls(deployment=deployment)
@@ -173,10 +198,73 @@ class DeploymentCore:
         await self.check_deployment()
         return await self.deployment.fetch_recent_running_status()
 
-    async def get_results(self) -> List[Dict[str, Any]]:
-        """Get deployment results"""
-        await self.check_deployment()
-        return await self.deployment.get_pipeline_results()
+    def _result_relay(self) -> ResultRelay:
+        if not self.deployment or not self.deployment.pipeline_id:
+            raise ObjectNotFoundError("服务不存在或推理管道未创建!")
+        return result_relays.get(
+            str(self.deployment.id),
+            self.deployment.gateway.get_api_url(),
+            self.deployment.pipeline_id,
+            self.deployment.output_image_fields
+        )
+
+    def get_result_relay(self, exclude_fields: Optional[List[str]] = None) -> ResultRelay:
+        """获取部署的结果中转并登记一次读取, 没有运行中的拉取任务时自动启动"""
+        relay = self._result_relay()
+        relay.touch(frozenset(exclude_fields or []))
+        return relay
+
+    async def get_results(
+        self,
+        since: Optional[int] = None,
+        exclude_fields: Optional[List[str]] = None,
+        image_mode: ImageMode = "inline",
+        epoch: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get deployment results
+
+        从结果中转读取, 不再每次请求都代理到网关。
+        since 为空时返回最新一条, 否则返回序号大于 since 的所有缓存结果。
+        epoch 为上次响应中的 epoch, 与当前不一致(序号已重置)或 since 超出当前序号时按最新一条返回。
+        image_mode 为 ref 时图像字段替换为帧引用, 通过 get_result_frame 获取二进制图像。
+        """
+        excludes = frozenset(exclude_fields or [])
+        relay = self.get_result_relay(exclude_fields)
+        if since is not None and ((epoch is not None and epoch != relay.epoch) or since > relay.last_seq):
+            since = None
+        if since is None:
+            # 已有缓存结果时直接返回最新一条, 只在刚启动、缓冲区为空时短暂等待
+            if not relay.buffer:
+                await relay.wait(relay.last_seq, timeout=RESULT_WAIT_TIMEOUT)
+        elif relay.last_seq <= since:
+            # 没有新结果时短暂等待
+            await relay.wait(since, timeout=RESULT_WAIT_TIMEOUT)
+        items = relay.latest(excludes, image_mode) if since is None else relay.since(since, excludes, image_mode)
+        return {
+            "status": "success",
+            "outputs": [item["output"] for item in items],
+            "frames_metadata": [item["frame_metadata"] for item in items],
+            "epoch": relay.epoch,
+            "last_seq": relay.last_seq,
+        }
+
+    async def get_result_frame(self, epoch: str, seq: int, field: str, max_width: Optional[int] = None) -> bytes:
+        """获取缓存结果中的图像, 返回 JPEG 字节; max_width 指定时返回缩小的预览图"""
+        item = self._result_relay().find(epoch, seq)
+        if item is None or field not in item.images:
+            raise ObjectNotFoundError("结果图像不存在或已过期")
+        return await self.encode_result_image(item, field, max_width)
+
+    @staticmethod
+    async def encode_result_image(item: RelayItem, field: str, max_width: Optional[int] = None) -> bytes:
+        """解码(并缩放)结果图像, 按 (字段, 宽度) 缓存在结果上, 多个读者共享"""
+        key = (field, max_width)
+        if key not in item.encoded:
+            image = base64.b64decode(item.images[field]["value"])
+            if max_width:
+                image, _, _ = await media_executor.run(resize_jpeg, image, max_width)
+            item.encoded[key] = image
+        return item.encoded[key]
 
     async def get_metrics_timerange(
         self,
@@ -188,10 +276,10 @@ class DeploymentCore:
         await self.check_deployment()
         return await self.deployment.get_pipeline_metrics_timerange(start_time, end_time, minutes)
 
-    async def pause_pipeline(self) -> bool:
+    async def pause_pipeline(self, persist: bool = True) -> bool:
         """Pause pipeline"""
         await self.check_deployment()
-        result = await self.deployment.pause_pipeline()
+        result = await self.deployment.pause_pipeline(persist=persist)
         if result:
             await EventLogger.log(
                 event_type=EventType.DEPLOYMENT_PAUSE,
@@ -201,10 +289,10 @@ class DeploymentCore:
             )
         return result
 
-    async def resume_pipeline(self) -> bool:
+    async def resume_pipeline(self, persist: bool = True) -> bool:
         """Resume pipeline"""
         await self.check_deployment()
-        result = await self.deployment.resume_pipeline()
+        result = await self.deployment.resume_pipeline(persist=persist)
         if result:
             await EventLogger.log(
                 event_type=EventType.DEPLOYMENT_RESUME,
@@ -235,8 +323,7 @@ class DeploymentCore:
             # 更新参数
             self.deployment.parameters = {
                 item['name']: self.deployment.parameters.get(item['name'], item['default_value']) 
-                for item in self.deployment.workflow.specification.get('inputs', [])
-                if item['type'] == 'WorkflowParameter'
+                for item in self.deployment.workflow.get_input_params()
             }
             # 更新输出图像字段
             self.deployment.output_image_fields = await self.deployment.workflow.get_output_image_fields()
@@ -258,3 +345,210 @@ class DeploymentCore:
         
         logger.info(f"Restarted pipeline for deployment: {self.deployment.id}")
         return True, "更新成功"
+
+    @classmethod
+    async def find_deployments(
+        cls,
+        workspace: WorkspaceModel,
+        deployment_ids: Optional[List[str]] = None,
+        gateway_id: Optional[str] = None,
+        workflow_id: Optional[str] = None,
+        running_status: Optional[OperationStatus] = None
+    ) -> List[DeploymentModel]:
+        """按 ID 列表或过滤条件查找工作空间内的部署"""
+        for object_id in (gateway_id, workflow_id):
+            if object_id and not PydanticObjectId.is_valid(object_id):
+                raise ValidationError(f"无效的ID: {object_id}")
+        filters: Dict[str, Any] = {"workspace.$id": workspace.id}
+        if deployment_ids is not None:
+            filters["_id"] = {"$in": [PydanticObjectId(i) for i in deployment_ids if PydanticObjectId.is_valid(i)]}
+        if gateway_id:
+            filters["gateway.$id"] = PydanticObjectId(gateway_id)
+        if workflow_id:
+            filters["workflow.$id"] = PydanticObjectId(workflow_id)
+        if running_status:
+            filters["running_status"] = running_status
+        return await DeploymentModel.find(filters, fetch_links=True).to_list()
+
+    @classmethod
+    async def bulk_operate(
+        cls,
+        action: BulkAction,
+        deployments: List[DeploymentModel],
+        requested_ids: Optional[List[str]] = None,
+        gateway_concurrency: int = None
+    ) -> BulkOperationResult:
+        """批量执行部署操作
+
+        - 同一网关上的操作并发数受 gateway_concurrency (默认 BULK_GATEWAY_CONCURRENCY) 限制, 不同网关之间并行
+        - 事件在结束时一次 insert_many 写入
+        - 暂停/恢复的状态、删除操作在结束时按成功的部署一次 update_many/delete_many 写入
+        """
+        started = time.perf_counter()
+        semaphores: Dict[str, asyncio.Semaphore] = {}
+        results: Dict[str, BulkItemResult] = {}
+        gateway_concurrency = gateway_concurrency or BULK_GATEWAY_CONCURRENCY
+
+        async def run(deployment: DeploymentModel) -> None:
+            deployment_id = str(deployment.id)
+            gateway_id = str(deployment.gateway.id)
+            semaphore = semaphores.setdefault(gateway_id, asyncio.Semaphore(gateway_concurrency))
+            async with semaphore:
+                try:
+                    message = await cls(deployment)._run_bulk_action(action)
+                    results[deployment_id] = BulkItemResult(deployment_id=deployment_id, name=deployment.name, success=True, message=message)
+                except Exception as e:
+                    message = getattr(e, 'message', None) or str(e)
+                    logger.warning(f"批量{action.value}部署 {deployment_id} 失败: {message}")
+                    results[deployment_id] = BulkItemResult(deployment_id=deployment_id, name=deployment.name, success=False, message=message)
+
+        async with EventLogger.batch():
+            await asyncio.gather(*[run(deployment) for deployment in deployments])
+
+        succeeded = [deployment.id for deployment in deployments if results[str(deployment.id)].success]
+        if succeeded:
+            if action == BulkAction.DELETE:
+                await DeploymentModel.find({"_id": {"$in": succeeded}}).delete_many()
+            elif action in BULK_STATUS:
+                await DeploymentModel.find({"_id": {"$in": succeeded}}).update_many(
+                    {"$set": {"running_status": BULK_STATUS[action], "updated_at": datetime.now()}}
+                )
+
+        items = [results[str(deployment.id)] for deployment in deployments]
+        found = set(results)
+        for deployment_id in requested_ids or []:
+            if deployment_id not in found:
+                items.append(BulkItemResult(deployment_id=deployment_id, success=False, message="服务不存在"))
+        logger.info(f"批量{action.value}部署: 共 {len(items)} 个, 成功 {len(succeeded)} 个, 耗时 {time.perf_counter() - started:.3f}s")
+        return BulkOperationResult(
+            action=action,
+            total=len(items),
+            succeeded=len(succeeded),
+            failed=len(items) - len(succeeded),
+            items=items
+        )
+
+    async def _run_bulk_action(self, action: BulkAction) -> str:
+        """执行单个部署的批量操作, 状态写入由 bulk_operate 统一完成"""
+        if action == BulkAction.PAUSE:
+            await self.pause_pipeline(persist=False)
+            return "暂停成功"
+        if action == BulkAction.RESUME:
+            await self.resume_pipeline(persist=False)
+            return "恢复成功"
+        if action == BulkAction.RESTART:
+            _, message = await self.restart_pipeline()
+            return message
+        # 删除: 先终止远程管道并记录事件, 文档由 bulk_operate 统一删除
+        await self.check_deployment()
+        await self.deployment.cleanup_pipeline()
+        await EventLogger.log(
+            event_type=EventType.DEPLOYMENT_DELETE,
+            workspace=self.deployment.workspace,
+            deployment=self.deployment,
+            gateway=self.deployment.gateway,
+            details={"name": self.deployment.name, "bulk": True}
+        )
+        return "删除成功"
+
+
+class WorkflowRollout:
+    """工作流变更的分批重启
+
+    一次索引查询找出 workflow_md5 与工作流当前 specification_md5 不一致的部署,
+    按 batch_size 分批, 每批通过 DeploymentCore.bulk_operate 重启, 批次之间等待 wave_interval 秒。
+    进度保存在内存中, 执行中的记录始终保留, 已结束的只保留最近 MAX_HISTORY 次。
+    """
+    MAX_HISTORY = 50
+
+    def __init__(self):
+        self._progress: Dict[str, RolloutProgress] = {}
+        self._running: Dict[str, str] = {}
+
+    @staticmethod
+    async def find_outdated(workflow: WorkflowModel) -> List[PydanticObjectId]:
+        """工作流下配置已过期的部署ID"""
+        deployments = await DeploymentModel.get_motor_collection().find(
+            {"workflow.$id": workflow.id, "workflow_md5": {"$ne": workflow.specification_md5}},
+            {"_id": 1}
+        ).to_list(length=None)
+        return [deployment["_id"] for deployment in deployments]
+
+    def get(self, rollout_id: str) -> Optional[RolloutProgress]:
+        return self._progress.get(rollout_id)
+
+    async def start(self, workflow: WorkflowModel, request: RolloutRequest) -> RolloutProgress:
+        workflow_id = str(workflow.id)
+        running = self._running.get(workflow_id)
+        if running:
+            raise InvalidStateError(f"工作流正在分批重启中: {running}")
+
+        # 在第一次 await 之前占位, 防止并发请求重复启动同一工作流的重启
+        rollout_id = uuid.uuid4().hex
+        self._running[workflow_id] = rollout_id
+        try:
+            deployment_ids = await self.find_outdated(workflow)
+        except Exception:
+            self._running.pop(workflow_id, None)
+            raise
+        waves = [deployment_ids[i:i + request.batch_size] for i in range(0, len(deployment_ids), request.batch_size)]
+        progress = RolloutProgress(
+            id=rollout_id,
+            workflow_id=workflow_id,
+            specification_md5=workflow.specification_md5,
+            total=len(deployment_ids),
+            total_waves=len(waves),
+        )
+        self._remember(progress)
+        if not waves:
+            self._running.pop(workflow_id, None)
+            progress.status = RolloutStatus.COMPLETED
+            progress.message = "没有需要重启的部署"
+            progress.finished_at = datetime.now()
+            return progress
+
+        spawn_background(self._run(progress, waves, request))
+        return progress
+
+    def _remember(self, progress: RolloutProgress) -> None:
+        self._progress[progress.id] = progress
+        # 只淘汰已结束的记录, 执行中的重启始终可以查询进度
+        finished = [rollout_id for rollout_id, item in self._progress.items() if item.finished_at is not None]
+        for rollout_id in finished[:max(0, len(self._progress) - self.MAX_HISTORY)]:
+            del self._progress[rollout_id]
+
+    async def _run(self, progress: RolloutProgress, waves: List[List[PydanticObjectId]], request: RolloutRequest) -> None:
+        try:
+            for index, wave in enumerate(waves, start=1):
+                progress.current_wave = index
+                # 每批重新加载, 使用最新的部署状态
+                deployments = await DeploymentModel.find({"_id": {"$in": wave}}, fetch_links=True).to_list()
+                result = await DeploymentCore.bulk_operate(
+                    action=BulkAction.RESTART,
+                    deployments=deployments,
+                    requested_ids=[str(deployment_id) for deployment_id in wave],
+                    gateway_concurrency=request.gateway_concurrency
+                )
+                progress.items.extend(result.items)
+                progress.completed += result.total
+                progress.succeeded += result.succeeded
+                progress.failed += result.failed
+                logger.info(f"工作流 {progress.workflow_id} 分批重启: 第 {index}/{progress.total_waves} 批, 成功 {result.succeeded}, 失败 {result.failed}")
+
+                if result.failed and request.stop_on_failure:
+                    progress.status = RolloutStatus.STOPPED
+                    progress.message = f"第 {index} 批有 {result.failed} 个部署重启失败, 已停止"
+                    return
+                if index < len(waves) and request.wave_interval:
+                    await asyncio.sleep(request.wave_interval)
+            progress.status = RolloutStatus.COMPLETED
+        except Exception as e:
+            logger.exception(f"工作流 {progress.workflow_id} 分批重启失败: {e}")
+            progress.status = RolloutStatus.FAILED
+            progress.message = str(e)
+        finally:
+            progress.finished_at = datetime.now()
+            self._running.pop(progress.workflow_id, None)
+
+
+workflow_rollout = WorkflowRollout()
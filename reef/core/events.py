@@ -1,10 +1,16 @@
-from typing import Optional, Dict, Any
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List
 
 from loguru import logger
 
 from reef.models import EventModel, EventType, WorkspaceModel, GatewayModel, DeploymentModel
 
 
+# 批量记录时收集事件的列表, 为 None 表示逐条写入
+_event_batch: ContextVar[Optional[List[EventModel]]] = ContextVar('event_batch', default=None)
+
+
 class EventLogger:
     @staticmethod
     async def log(
@@ -22,7 +28,28 @@ class EventLogger:
                 deployment=deployment,
                 details=details or {},
             )
+            batch = _event_batch.get()
+            if batch is not None:
+                batch.append(event)
+                return
             await event.insert()
             logger.info(f"Logged event: {event_type.value} for workspace {workspace.id}")
         except Exception as e:
-            logger.exception(f"Failed to log event {event_type.value}: {e}") 
\ No newline at end of file
+            logger.exception(f"Failed to log event {event_type.value}: {e}")
+
+    @staticmethod
+    @asynccontextmanager
+    async def batch():
+        """批量记录事件: 上下文内(含其中创建的任务)记录的事件在退出时一次 insert_many 写入"""
+        events: List[EventModel] = []
+        token = _event_batch.set(events)
+        try:
+            yield events
+        finally:
+            _event_batch.reset(token)
+            if events:
+                try:
+                    await EventModel.insert_many(events)
+                    logger.info(f"Logged {len(events)} events in batch")
+                except Exception as e:
+                    logger.exception(f"Failed to log {len(events)} events in batch: {e}")
@@ -16,6 +16,7 @@ from reef.exceptions import (
     ObjectNotFoundError,
     AssociatedObjectExistsError
 )
+from reef.utlis._utils import update_document
 
 
 class GatewayCore:
@@ -67,11 +68,7 @@ class GatewayCore:
         """Update an existing gateway."""
         await self.check_gateway()
 
-        for key, value in gateway_data.items():
-            setattr(self.gateway, key, value)
-        
-        self.gateway.updated_at = datetime.now()
-        await self.gateway.save()
+        await update_document(self.gateway, gateway_data)
 
     async def delete_gateway(self) -> None:
         """Delete a gateway and update related entities."""
@@ -95,8 +92,7 @@ class GatewayCore:
         logger.info(f'删除与网关 {self.gateway.id} 关联的 {await cameras.count()} 台相机 & 删除网关!')
 
         await cameras.delete()
-        self.gateway.status = GatewayStatus.DELETED
-        await self.gateway.save()
+        await update_document(self.gateway, {"status": GatewayStatus.DELETED})
 
     async def get_cameras(self) -> List[CameraModel]:
         """Get all cameras for this gateway."""
@@ -24,6 +24,7 @@ from reef.exceptions import ValidationError
 from reef.utlis.roboflow import get_roboflow_model_data, get_roboflow_model_ids, get_models_type
 from reef.utlis.cloud import upload_data_to_cloud, transfer_object, download_from_cloud
 from reef.utlis.convert.onnx2rknn import ConvertOnnxToRknn
+from reef.utlis._utils import update_document
 
 
 class MLModelCore:
@@ -151,11 +152,7 @@ class MLModelCore:
 
     async def update_model(self, model_data: dict) -> None:
         """Update an existing ML model."""
-        for key, value in model_data.items():
-            setattr(self.model, key, value)
-        
-        self.model.updated_at = datetime.now()
-        await self.model.save()
+        await update_document(self.model, model_data)
         logger.info(f'Updated ML model: {self.model.id}')
 
     async def delete_model(self) -> None:
@@ -167,9 +164,7 @@ class MLModelCore:
     
     async def set_model_visibility(self, is_public: bool) -> None:
         """Set model visibility (public/private)."""
-        self.model.is_public = is_public
-        self.model.updated_at = datetime.now()
-        await self.model.save()
+        await update_document(self.model, {"is_public": is_public})
         logger.info(f'Updated ML model visibility: {self.model.id}, is_public: {is_public}')
     
     async def convert_onnx_to_rknn(self) -> None:
@@ -218,9 +213,7 @@ class MLModelCore:
                 await upload_data_to_cloud(f.read(), rknn_key)
             
             # 更新模型记录
-            self.model.rknn_model_url = rknn_key
-            self.model.updated_at = datetime.now()
-            await self.model.save()
+            await update_document(self.model, {"rknn_model_url": rknn_key})
             
             logger.info(f"RKNN模型转换完成并已上传: {rknn_key}")
             
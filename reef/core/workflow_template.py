@@ -1,17 +1,26 @@
 import json
-import copy
+import base64
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 from loguru import logger
+from beanie import PydanticObjectId
 
 from reef.models import WorkflowTemplateModel, WorkflowModel, UserModel, WorkspaceModel
-from reef.exceptions import ObjectNotFoundError
-from reef.utlis.roboflow import get_roboflow_worflows
+from reef.exceptions import ObjectNotFoundError, ValidationError
+from reef.models.workflow_template import TemplateSummary, TemplateForkStats
+from reef.utlis.roboflow import get_roboflow_worflows, describe_index
+from reef.utlis.workflow_graph import build_workflow_data
+from reef.utlis._utils import update_document
 from reef.schemas.workflows import WorkflowSpecification
 from reef.schemas import PaginationResponse, PaginationParams
-from reef.schemas.workflow_template import TemplateResponse
-from reef.templates.workflow_nodes import INPUT_NODE_TEMPLATE, STEP_NODE_TEMPLATE, OUTPUT_NODE_TEMPLATE
-from reef.utlis.roboflow import get_block_by_identifier
+from reef.schemas.workflow_template import TemplateResponse, TemplateCursorResponse, TemplateSort, PopularTemplateResponse
+
+# 模板库排序方式对应的字段
+SORT_FIELDS = {
+    TemplateSort.USAGE: "usage_count",
+    TemplateSort.RECENT: "created_at",
+}
+
 
 class WorkflowTemplate:
     def __init__(
@@ -34,14 +43,14 @@ class WorkflowTemplate:
         workflow_id: str,
         creator: UserModel,
         project_id: str = None,
-        api_key: str = None
+        api_key: str = None,
+        version: str = None
     ) -> 'WorkflowTemplate':
         """从 Roboflow 同步工作流为模板"""
-        roboflow_workflows = await get_roboflow_worflows(workflow_id, project_id, api_key)
+        roboflow_workflows = await get_roboflow_worflows(workflow_id, project_id, api_key, version)
         logger.info(f'从Roboflow同步工作流: {project_id}/{workflow_id}')
         
         specification = json.loads(roboflow_workflows["config"])['specification']
-        print(f'specification: {specification}')
         template = WorkflowTemplateModel(
             name=roboflow_workflows["name"],
             description=roboflow_workflows.get("description", ""),
@@ -49,6 +58,7 @@ class WorkflowTemplate:
             data=await cls.specification_to_workflow_data(WorkflowSpecification(**specification)),
             is_public=False,
             creator=creator,
+            creator_name=creator.username,
             roboflow_id=f"{project_id}/{workflow_id}",
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -61,158 +71,13 @@ class WorkflowTemplate:
     @classmethod
     async def specification_to_workflow_data(cls, specification: WorkflowSpecification) -> dict:
         """Convert a specification to workflow data."""
-        nodes = []
-        edges = []
-        
-        # 添加输入节点
-        input_node = copy.deepcopy(INPUT_NODE_TEMPLATE)
-        input_node["data"]["formData"]["sources"] = [{"name": "image"}]
-        input_node["data"]["formData"]["params"] = [{"name": step['name'], "value": step['default_value']} for step in specification.inputs if step['type'] == 'WorkflowParameter']
-        nodes.append(input_node)
-        
-        # 创建步骤名称到索引的映射
-        step_name_to_index = {step['name']: i for i, step in enumerate(specification.steps)}
-        
-        # 添加处理步骤节点
-        for i, step in enumerate(specification.steps):
-            step_node = copy.deepcopy(STEP_NODE_TEMPLATE)
-            step_node["id"] = f"{step['type']}-{i}"
-            step_node["position"] = {"x": 160 + i * 200, "y": 120 + i * 100}
-            step_node["data"] = await get_block_by_identifier(step['type'])
-            step_node["data"]["formData"] = step
-            nodes.append(step_node)
-        
-        # 基于依赖关系构建边 - 每个节点只连接最近的上游节点
-        for i, step in enumerate(specification.steps):
-            step_id = f"{step['type']}-{i}"
-            dependencies = cls._extract_step_dependencies(step)
-            
-            # 找到最近的上游节点
-            closest_upstream = None
-            max_upstream_index = -1
-            
-            # 检查对其他步骤的依赖，找到索引最大的（最近的）
-            for dep_step_name in dependencies:
-                if dep_step_name in step_name_to_index:
-                    dep_index = step_name_to_index[dep_step_name]
-                    if dep_index > max_upstream_index:
-                        max_upstream_index = dep_index
-                        closest_upstream = f"{specification.steps[dep_index]['type']}-{dep_index}"
-            
-            # 如果有最近的上游步骤，连接到它
-            if closest_upstream:
-                edges.append({
-                    "source": closest_upstream,
-                    "target": step_id,
-                    "id": f"reactflow__edge-{closest_upstream}-{step_id}"
-                })
-            # 否则检查是否需要连接到输入节点
-            elif cls._has_input_dependency(step):
-                edges.append({
-                    "source": "input-node",
-                    "target": step_id,
-                    "id": f"reactflow__edge-input-node-{step_id}"
-                })
-            # 如果没有任何依赖，连接到前一个步骤（保持线性）
-            elif i > 0:
-                prev_step_id = f"{specification.steps[i-1]['type']}-{i-1}"
-                edges.append({
-                    "source": prev_step_id,
-                    "target": step_id,
-                    "id": f"reactflow__edge-{prev_step_id}-{step_id}"
-                })
-            # 第一个步骤且没有依赖，连接到输入
-            else:
-                edges.append({
-                    "source": "input-node",
-                    "target": step_id,
-                    "id": f"reactflow__edge-input-node-{step_id}"
-                })
-        
-        # 添加输出节点
-        output_node = copy.deepcopy(OUTPUT_NODE_TEMPLATE)
-        output_node["data"]["formData"]["params"] = [{
-            "name": output["name"],
-            "selector": output["selector"],
-            "value": output["selector"]
-        } for output in specification.outputs]
-        nodes.append(output_node)
-        
-        # 连接输出依赖的步骤到输出节点 - 只连接没有下游节点的步骤
-        output_dependencies = set()
-        for output in specification.outputs:
-            if output["selector"].startswith("$steps."):
-                step_name = output["selector"].split(".")[1]
-                if step_name in step_name_to_index:
-                    output_dependencies.add(step_name)
-        
-        # 找出所有作为上游节点的步骤（有下游节点的步骤）
-        steps_with_downstream = set()
-        for i, step in enumerate(specification.steps):
-            dependencies = cls._extract_step_dependencies(step)
-            steps_with_downstream.update(dependencies)
-        
-        # 只连接输出依赖中没有下游节点的步骤
-        for dep_step_name in output_dependencies:
-            if dep_step_name not in steps_with_downstream:
-                dep_index = step_name_to_index[dep_step_name]
-                source_id = f"{specification.steps[dep_index]['type']}-{dep_index}"
-                edges.append({
-                    "source": source_id,
-                    "target": "output-node",
-                    "id": f"reactflow__edge-{source_id}-output-node"
-                })
-        
-        return {
-            "nodes": nodes,
-            "edges": edges
-        }
-    
-    @classmethod
-    def _extract_step_dependencies(cls, step: dict) -> set:
-        """提取步骤中对其他步骤的依赖"""
-        import re
-        dependencies = set()
-        
-        def extract_from_value(value):
-            if isinstance(value, str) and "$steps." in value:
-                # 更精确的正则表达式，匹配 $steps.step_name.property 格式
-                matches = re.findall(r'\$steps\.([^.\s\[\]]+)(?:\.[^.\s\[\]]+)*', value)
-                dependencies.update(matches)
-            elif isinstance(value, dict):
-                for v in value.values():
-                    extract_from_value(v)
-            elif isinstance(value, list):
-                for item in value:
-                    extract_from_value(item)
-        
-        # 递归提取所有字段中的依赖
-        for key, value in step.items():
-            if key != 'name' and key != 'type':  # 排除名称和类型字段
-                extract_from_value(value)
-        
-        return dependencies
-    
-    @classmethod
-    def _has_input_dependency(cls, step: dict) -> bool:
-        """检查步骤是否依赖输入"""
-        
-        def check_value(value):
-            if isinstance(value, str) and "$inputs." in value:
-                return True
-            elif isinstance(value, dict):
-                return any(check_value(v) for v in value.values())
-            elif isinstance(value, list):
-                return any(check_value(item) for item in value)
-            return False
-        
-        # 检查所有字段是否包含输入依赖
-        for key, value in step.items():
-            if key != 'name' and key != 'type':  # 排除名称和类型字段
-                if check_value(value):
-                    return True
-        
-        return False
+        await describe_index.ensure_loaded()
+        return build_workflow_data(
+            specification.inputs,
+            specification.steps,
+            specification.outputs,
+            describe_index.blocks.get,
+        )
     
     @classmethod
     async def publish_template(
@@ -231,6 +96,7 @@ class WorkflowTemplate:
             data=workflow.data,
             is_public=is_public,
             creator=workflow.creator,
+            creator_name=getattr(workflow.creator, "username", None),
             tags=tags,
             created_at=datetime.now(),
             updated_at=datetime.now()
@@ -249,11 +115,12 @@ class WorkflowTemplate:
         sort_desc: bool = True
     ) -> PaginationResponse[TemplateResponse]:
         """获取模板列表"""
-        find_query = WorkflowTemplateModel.find(fetch_links=True)
+        filters = {}
         if is_public is not None:
-            find_query = WorkflowTemplateModel.find(WorkflowTemplateModel.is_public == is_public, fetch_links=True)
+            filters["is_public"] = is_public
         if creator:
-            find_query = find_query.find(WorkflowTemplateModel.creator.id == creator.id, fetch_links=True)
+            filters["creator.$id"] = creator.id
+        find_query = WorkflowTemplateModel.find(filters)
         
         # 计算总记录数
         total = await find_query.count()
@@ -272,7 +139,7 @@ class WorkflowTemplate:
             total_pages = (total + pagination.page_size - 1) // pagination.page_size
             skip = (pagination.page - 1) * pagination.page_size
             find_query = find_query.skip(skip).limit(pagination.page_size)
-            templates = await find_query.to_list()
+            templates = await cls._fill_creator_names(await find_query.project(TemplateSummary).to_list())
             
             return PaginationResponse(
                 total=total,
@@ -283,7 +150,7 @@ class WorkflowTemplate:
             )
         else:
             # 如果没有分页参数，返回所有记录
-            templates = await find_query.to_list()
+            templates = await cls._fill_creator_names(await find_query.project(TemplateSummary).to_list())
             return PaginationResponse(
                 total=total,
                 page=1,
@@ -291,20 +158,118 @@ class WorkflowTemplate:
                 total_pages=1,
                 items=[TemplateResponse.db_to_schema(template) for template in templates]
             )
+
+    @classmethod
+    async def search_templates(
+        cls,
+        user: UserModel,
+        query: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        mine: bool = False,
+        sort: TemplateSort = TemplateSort.USAGE,
+        cursor: Optional[str] = None,
+        limit: int = 20
+    ) -> TemplateCursorResponse:
+        """模板库搜索
+
+        文本索引匹配名称/标签/描述，标签精确过滤走 tags 多键索引。
+        按 (排序字段, _id) 倒序做 keyset 分页，翻页代价与页码无关。
+        """
+        filters = [{"creator.$id": user.id} if mine else {"is_public": True}]
+        if query:
+            filters.append({"$text": {"$search": query}})
+        if tags:
+            filters.append({"tags": {"$all": tags}})
+
+        sort_field = SORT_FIELDS[sort]
+        if cursor:
+            value, last_id = cls._decode_cursor(cursor, sort)
+            filters.append({"$or": [
+                {sort_field: {"$lt": value}},
+                {sort_field: value, "_id": {"$lt": last_id}},
+            ]})
+
+        templates = await WorkflowTemplateModel.find({"$and": filters}).sort(
+            (sort_field, -1), ("_id", -1)
+        ).limit(limit + 1).project(TemplateSummary).to_list()
+
+        next_cursor = None
+        if len(templates) > limit:
+            templates = templates[:limit]
+            last = templates[-1]
+            next_cursor = cls._encode_cursor(getattr(last, sort_field), last.id, sort)
+
+        templates = await cls._fill_creator_names(templates)
+        return TemplateCursorResponse(
+            items=[TemplateResponse.db_to_schema(template) for template in templates],
+            next_cursor=next_cursor
+        )
+
+    @classmethod
+    async def popular_templates(cls, days: int = 7, limit: int = 20) -> List[PopularTemplateResponse]:
+        """最近 days 天复制次数最多的公开模板"""
+        since = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+        # 多取一些, 过滤掉已删除或非公开的模板
+        ranking = await TemplateForkStats.top_templates(since, limit * 2)
+        if not ranking:
+            return []
+        templates = await WorkflowTemplateModel.find(
+            {"_id": {"$in": [template_id for template_id, _ in ranking]}, "is_public": True}
+        ).project(TemplateSummary).to_list()
+        templates = {template.id: template for template in await cls._fill_creator_names(templates)}
+        return [
+            PopularTemplateResponse(template=TemplateResponse.db_to_schema(templates[template_id]), recent_forks=forks)
+            for template_id, forks in ranking if template_id in templates
+        ][:limit]
+
+    @staticmethod
+    def _encode_cursor(value, last_id: PydanticObjectId, sort: TemplateSort) -> str:
+        if sort == TemplateSort.RECENT:
+            value = value.isoformat()
+        raw = json.dumps([value, str(last_id)], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def _decode_cursor(cursor: str, sort: TemplateSort) -> tuple:
+        try:
+            value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            # bool 是 int 的子类, 需要单独排除
+            if isinstance(value, bool):
+                raise ValueError(value)
+            if sort == TemplateSort.RECENT:
+                if not isinstance(value, str):
+                    raise ValueError(value)
+                value = datetime.fromisoformat(value)
+            elif not isinstance(value, int):
+                raise ValueError(value)
+            return value, PydanticObjectId(last_id)
+        except Exception:
+            raise ValidationError("无效的分页游标")
+
+    @staticmethod
+    async def _fill_creator_names(templates: List[TemplateSummary]) -> List[TemplateSummary]:
+        """历史模板没有冗余的创建者用户名，批量查询补全并回写"""
+        missing = {template.creator.id for template in templates if template.creator_name is None and template.creator}
+        if not missing:
+            return templates
+        users = await UserModel.find({"_id": {"$in": list(missing)}}).to_list()
+        names = {user.id: user.username for user in users}
+        for user_id, username in names.items():
+            await WorkflowTemplateModel.find(
+                {"creator.$id": user_id, "creator_name": None}
+            ).update_many({"$set": {"creator_name": username}})
+        for template in templates:
+            if template.creator_name is None and template.creator:
+                template.creator_name = names.get(template.creator.id)
+        return templates
     
     async def update_template(self, template_data: dict) -> None:
         """更新模板信息"""
-        for key, value in template_data.items():
-            setattr(self.template, key, value)
-        
-        self.template.updated_at = datetime.now()
-        await self.template.save()
+        await update_document(self.template, template_data)
     
     async def toggle_visibility(self) -> None:
         """切换模板可见性"""
-        self.template.is_public = not self.template.is_public
-        self.template.updated_at = datetime.now()
-        await self.template.save()
+        await update_document(self.template, {"is_public": not self.template.is_public})
     
     async def delete_template(self) -> None:
         """删除模板"""
@@ -323,11 +288,15 @@ class WorkflowTemplate:
             created_at=datetime.now(),
             updated_at=datetime.now()
         )
+        workflow.compile()
         await workflow.save()
         
-        # 更新使用次数
+        # 原子累加使用次数, 不重写整个模板文档
+        await WorkflowTemplateModel.find_one(
+            WorkflowTemplateModel.id == self.template.id
+        ).update({"$inc": {WorkflowTemplateModel.usage_count: 1}})
         self.template.usage_count += 1
-        await self.template.save()
+        await TemplateForkStats.record_fork(self.template.id, target_workspace.id)
         
         logger.info(f'复制模板到工作空间: {workflow.id}')
         return workflow
\ No newline at end of file
@@ -1,9 +1,12 @@
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from loguru import logger
+from beanie import PydanticObjectId
 
 from reef.models import WorkflowModel, WorkspaceModel, UserModel, DeploymentModel
-from reef.exceptions import ObjectNotFoundError, AssociatedObjectExistsError
+from reef.models.workflows import WorkflowSummary, compile_workflow
+from reef.exceptions import ObjectNotFoundError, AssociatedObjectExistsError, ValidationError
+from reef.utlis._utils import update_document
 
 class WorkflowCore:
     def __init__(
@@ -28,6 +31,30 @@ class WorkflowCore:
             fetch_links=True
         ).sort("-created_at").to_list()
 
+    @classmethod
+    async def get_workspace_workflow_summaries(cls, workspace: WorkspaceModel) -> List[WorkflowSummary]:
+        """Get workflow summaries for this workspace, projected without data/specification."""
+        summaries = await WorkflowModel.find(
+            WorkflowModel.workspace.id == workspace.id
+        ).sort("-created_at").project(WorkflowSummary).to_list()
+        for summary in summaries:
+            summary.workspace_name = workspace.name
+        return summaries
+
+    @classmethod
+    async def get_workflow_summary(cls, workflow_id: str) -> Optional[WorkflowSummary]:
+        """Get a workflow summary by ID, with the workspace name used by its ETag."""
+        if not PydanticObjectId.is_valid(workflow_id):
+            return None
+        summary = await WorkflowModel.find_one(
+            WorkflowModel.id == PydanticObjectId(workflow_id)
+        ).project(WorkflowSummary)
+        if summary is not None and summary.workspace is not None:
+            # 只读取工作空间名称, 不加载整个关联文档
+            workspace = await WorkspaceModel.get_motor_collection().find_one({"_id": summary.workspace.id}, {"name": 1})
+            summary.workspace_name = workspace["name"] if workspace else None
+        return summary
+
     @classmethod
     async def create_workflow(cls, workflow_data: dict, workspace: WorkspaceModel, creator: UserModel) -> 'WorkflowCore':
         """Create a new workflow."""
@@ -38,17 +65,26 @@ class WorkflowCore:
             created_at=datetime.now(),
             updated_at=datetime.now()
         )
+        for key, value in cls._compile(workflow.data).items():
+            setattr(workflow, key, value)
         await workflow.save()
         logger.info(f'创建工作流: {workflow.id}')
         return cls(workflow=workflow)
 
     async def update_workflow(self, workflow_data: dict) -> None:
         """Update an existing workflow."""
-        for key, value in workflow_data.items():
-            setattr(self.workflow, key, value)
-        
-        self.workflow.updated_at = datetime.now()
-        await self.workflow.save()
+        fields = dict(workflow_data)
+        if 'data' in workflow_data:
+            fields.update(self._compile(workflow_data['data']))
+        await update_document(self.workflow, fields)
+
+    @staticmethod
+    def _compile(data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """编译工作流定义，节点数据不完整时返回参数错误"""
+        try:
+            return compile_workflow(data)
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValidationError(f"工作流数据格式错误: {e}")
 
     async def delete_workflow(self) -> None:
         """Delete a workflow."""
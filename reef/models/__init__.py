@@ -5,7 +5,7 @@ from .gateways import GatewayModel, GatewayStatus
 from .cameras import CameraModel, CameraType
 from .workflows import WorkflowModel
 from .deployments import DeploymentModel, OperationStatus
-from .workflow_template import WorkflowTemplateModel
+from .workflow_template import WorkflowTemplateModel, TemplateForkStats
 from .ml_models import (
     MLModelModel, 
     MLPlatform, 
@@ -32,6 +32,7 @@ INIT_MODELS = [
     WorkspaceUserModel,
     BlockTranslation,
     WorkflowTemplateModel,
+    TemplateForkStats,
     EventModel
 ]
 
@@ -55,6 +56,7 @@ __all__ = [
     "AutoOrientConfig",
     "OperationStatus",
     "WorkflowTemplateModel",
+    "TemplateForkStats",
     "EventModel",
     "EventType",
     "INIT_MODELS"
@@ -1,5 +1,7 @@
+import json
+import hashlib
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from enum import Enum
 from beanie import Document, Link
 from pydantic import BaseModel, Field
@@ -24,24 +26,63 @@ class BlockTranslation(Document):
     created_at: datetime = Field(default_factory=datetime.now, description="创建时间")
     updated_at: datetime = Field(default_factory=datetime.now, description="更新时间")
     sync_at: Optional[datetime] = Field(default=None, description="同步更新时间")
+    source_hash: Optional[str] = Field(default=None, description="上次同步时源数据 block_schema.properties 的结构哈希")
 
     class Settings:
         name = "block_translations"
 
 
+def schema_properties_hash(properties: Dict) -> str:
+    """计算 block_schema.properties 的结构哈希 (键排序后的规范化 JSON)"""
+    canonical = json.dumps(properties, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.md5(canonical.encode('utf-8')).hexdigest()
+
+
+
+class BlockTranslationCache:
+    """按语言缓存已启用的区块翻译
+
+    每种语言只需一次查询即可加载全部已启用翻译，得到以 manifest_type_identifier 为键的映射。
+    翻译有任何写操作时调用 invalidate，版本号递增，已加载的映射全部失效。
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._maps: Dict[Language, Tuple[int, Dict[str, BlockTranslation]]] = {}
+
+    def invalidate(self) -> None:
+        self.version += 1
+        self._maps.clear()
+
+    async def get_map(self, language: Language) -> Dict[str, BlockTranslation]:
+        cached = self._maps.get(language)
+        if cached and cached[0] == self.version:
+            return cached[1]
+
+        version = self.version
+        translations = await BlockTranslation.find(
+            BlockTranslation.language == language,
+            BlockTranslation.disabled == False
+        ).to_list()
+        mapper = {t.manifest_type_identifier: t for t in translations}
+        # 加载期间发生写操作时不缓存旧数据
+        if version == self.version:
+            self._maps[language] = (version, mapper)
+        return mapper
+
+
+block_translation_cache = BlockTranslationCache()
+
 
 async def get_translated_blocks(blocks: List[BaseModel], language: Language = Language.EN):
     """获取指定语言的翻译版本"""
+    translations = await block_translation_cache.get_map(language)
     for block in blocks:
-        blocks_translation = await BlockTranslation.find_one(
-            BlockTranslation.manifest_type_identifier == block.manifest_type_identifier,
-            language=language,
-            disabled=False
-        )
+        blocks_translation = translations.get(block.manifest_type_identifier)
 
         if blocks_translation:
             block.human_friendly_block_name = blocks_translation.human_friendly_block_name
             block.block_schema = blocks_translation.block_schema
             block.execution_engine_compatibility = blocks_translation.execution_engine_compatibility
         
-    return blocks
\ No newline at end of file
+    return blocks
@@ -5,13 +5,50 @@ from typing import Optional, Union
 import cv2
 import base64
 import numpy as np
-from pydantic import Field
+from loguru import logger
+from pydantic import BaseModel, Field
 from beanie import Document, Link
 from reef.models.workspaces import WorkspaceModel
 from reef.models.gateways import GatewayModel
-from reef.utlis.cloud import sign_url
+from reef.utlis.cloud import sign_url, get_object_etag
+from reef.utlis.media import media_executor
 from reef.exceptions import RemoteCallError
 
+
+EMPTY_VIDEO_INFO = {
+    "width": None,
+    "height": None,
+    "fps": None,
+    "total_frames": None
+}
+
+
+def probe_video_source(path: str) -> dict:
+    """打开视频源读取宽高、帧率和总帧数 (阻塞调用)"""
+    try:
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            return dict(EMPTY_VIDEO_INFO)
+
+        # 获取视频信息
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        # 释放VideoCapture对象
+        cap.release()
+
+        return {
+            "width": width if width > 0 else None,
+            "height": height if height > 0 else None,
+            "fps": fps if fps > 0 else None,
+            "total_frames": total_frames if total_frames > 0 else None
+        }
+    except Exception:
+        # 如果获取失败，返回None值
+        return dict(EMPTY_VIDEO_INFO)
+
 class CameraType(str, Enum):
     USB = "usb"
     RTSP = "rtsp"
@@ -25,6 +62,24 @@ class CameraType(str, Enum):
         return [member.value for member in cls]
 
 
+class VideoProbe(BaseModel):
+    width: Optional[int] = Field(default=None, description="视频宽度")
+    height: Optional[int] = Field(default=None, description="视频高度")
+    fps: Optional[float] = Field(default=None, description="帧率")
+    total_frames: Optional[int] = Field(default=None, description="总帧数")
+    path: Union[str, int] = Field(description="探测时的视频路径")
+    etag: Optional[str] = Field(default=None, description="探测时 OSS 对象的 ETag")
+    probed_at: datetime = Field(default_factory=datetime.now, description="探测时间")
+
+    @property
+    def is_complete(self) -> bool:
+        """宽高和帧率都探测成功, 打开失败(OSS/网络抖动)得到的空结果不可复用"""
+        return self.width is not None and self.height is not None and self.fps is not None
+
+    def to_video_info(self) -> dict:
+        return self.model_dump(include={"width", "height", "fps", "total_frames"})
+
+
 class CameraModel(Document):
     name: str = Field(description="摄像头名称")
     description: str = Field(description="摄像头描述")
@@ -34,64 +89,17 @@ class CameraModel(Document):
     created_at: datetime = Field(default_factory=datetime.now, description="创建时间")
     updated_at: datetime = Field(default_factory=datetime.now, description="更新时间")
     workspace: Link[WorkspaceModel] = Field(description="所属工作空间")
+    keep_warm: bool = Field(default=False, description="是否常驻取流, 开启后快照直接读取缓存")
+    video_probe: Optional[VideoProbe] = Field(default=None, description="文件视频的探测信息")
 
     class Settings:
         name = "cameras"
     
     async def fetch_snapshot(self) -> str:
         """Fetch a snapshot from camera."""
-        from reef.utlis.pipeline import PipelineClient
-        # 如果 gateway 不为空且 type 为 USB，则使用 pipeline 方式
-        if self.gateway and self.type == CameraType.USB:
-            try:
-                gateway_url = self.gateway.get_api_url()
-                pipeline_client = PipelineClient(api_url=gateway_url)
-                # 调用 pipeline 客户端的视频帧捕获接口
-                result = await pipeline_client.capture_video_frame(video_source=self.path)
-                if result.get('status') == 'success':
-                    return result['image_base64']
-                else:
-                    raise RemoteCallError(f"获取视频帧失败: {result.get('error')}")
-                    
-            except Exception as e:
-                raise RemoteCallError(f"获取视频帧失败: {e}")
-        else:
-            # 尝试使用 cv2.VideoCapture 读取视频帧
-            try:
-                # 根据类型处理路径
-                if self.type == CameraType.FILE:
-                    path = await sign_url(self.path)
-                else:
-                    path = str(self.path)
-                
-                cap = cv2.VideoCapture(path)
-                
-                if not cap.isOpened():
-                    raise RemoteCallError("无法打开视频源")
-
-                count = 0 
-                while count < 5: 
-                    ret, frame = cap.read()
-                    if not ret or frame is None:
-                        count += 1
-                    else:
-                        break
-
-                cap.release()
-                
-                if frame is not None:
-                    # 将帧编码为JPEG格式
-                    success, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
-                    if success:
-                        # 转换为base64
-                        image_base64 = base64.b64encode(buffer).decode('utf-8')
-                        return image_base64
-                    else:
-                        raise RemoteCallError("无法编码图片为JPEG格式")
-                else:
-                    raise RemoteCallError("无法读取帧")
-            except Exception as e:
-                raise RemoteCallError(f"获取视频帧失败: {e}")
+        from reef.utlis.snapshot import snapshot_service
+        image = await snapshot_service.get_snapshot(self)
+        return base64.b64encode(image).decode('utf-8')
     
     async def fetch_webrtc_video_stream(self, webrtc_config: dict) -> dict:
         """Fetch a webrtc video stream from camera."""
@@ -125,46 +133,36 @@ class CameraModel(Document):
         """Get video information from camera."""
         # 只有特定类型的摄像头才获取视频信息
         if self.type not in [CameraType.FILE, CameraType.URL, CameraType.RTSP]:
-            return {
-                "width": None,
-                "height": None,
-                "fps": None,
-                "total_frames": None
-            }
-        
+            return dict(EMPTY_VIDEO_INFO)
+
+        # 文件视频使用持久化的探测结果
+        if self.type == CameraType.FILE:
+            probe = self.video_probe
+            if probe is None or probe.path != self.path or not probe.is_complete:
+                probe = await self.refresh_video_probe()
+            return probe.to_video_info() if probe else dict(EMPTY_VIDEO_INFO)
+
+        return await media_executor.run(probe_video_source, str(self.path))
+
+    async def refresh_video_probe(self, force: bool = False) -> Optional[VideoProbe]:
+        """探测文件视频信息并持久化, OSS 对象 ETag 未变化时直接复用已有结果"""
+        if self.type != CameraType.FILE:
+            return None
         try:
-            # 创建VideoCapture对象
-            path = await sign_url(self.path) if self.type == CameraType.FILE else str(self.path)
-            cap = cv2.VideoCapture(path)
-            
-            if not cap.isOpened():
-                return {
-                    "width": None,
-                    "height": None,
-                    "fps": None,
-                    "total_frames": None
-                }
-            
-            # 获取视频信息
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            
-            # 释放VideoCapture对象
-            cap.release()
-            
-            return {
-                "width": width if width > 0 else None,
-                "height": height if height > 0 else None,
-                "fps": fps if fps > 0 else None,
-                "total_frames": total_frames if total_frames > 0 else None
-            }
+            etag = await get_object_etag(self.path)
+            probe = self.video_probe
+            if not force and probe and probe.path == self.path and probe.etag == etag and probe.is_complete:
+                return probe
+
+            info = await media_executor.run(probe_video_source, await sign_url(self.path))
+            probe = VideoProbe(**info, path=self.path, etag=etag, probed_at=datetime.now())
+            if not probe.is_complete:
+                # 不持久化不完整的结果, 下次调用时重新探测
+                logger.warning(f"探测视频信息不完整, 稍后重试: {self.id}")
+                return None
+            self.video_probe = probe
+            await self.set({CameraModel.video_probe: probe.model_dump()})
+            return probe
         except Exception as e:
-            # 如果获取失败，返回None值
-            return {
-                "width": None,
-                "height": None,
-                "fps": None,
-                "total_frames": None
-            }
+            logger.warning(f"探测视频信息失败: {self.id}, {e}")
+            return None
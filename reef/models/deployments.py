@@ -1,18 +1,25 @@
+import copy
+import time
 import asyncio
 from enum import Enum
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from pydantic import Field
-from beanie import Document, Link, before_event, Replace, Insert, Delete
+from typing import List, Dict, Any, Optional, Tuple
+from pydantic import Field, PrivateAttr
+from beanie import Document, Link, PydanticObjectId, before_event, after_event, Replace, Insert, Save, Delete
 
+from pymongo import ASCENDING, IndexModel
 from inference_sdk.http.errors import HTTPCallErrorError
 
 import requests
 from loguru import logger
 
 from reef.utlis.pipeline import PipelineClient
+from reef.utlis.result_relay import result_relays
 from reef.utlis.cloud import sign_url
+from reef.utlis._utils import spawn_background, update_document
 from reef.exceptions import RemoteCallError
+from reef.config import settings
 
 from .workspaces import WorkspaceModel
 from .gateways import GatewayModel
@@ -31,6 +38,53 @@ class OperationStatus(str, Enum):
     TIMEOUT = "timeout"
 
 
+def _link_id(value) -> Optional[PydanticObjectId]:
+    """已关联的文档或未关联的 Link 都返回其 id"""
+    if value is None:
+        return None
+    if isinstance(value, Link):
+        return value.ref.id
+    return value.id
+
+
+@dataclass
+class PipelineState:
+    """决定推理管道是否需要重建的字段快照"""
+    camera_ids: List[Optional[PydanticObjectId]]
+    workflow_id: Optional[PydanticObjectId]
+    gateway_id: Optional[PydanticObjectId]
+    parameters: Dict[str, Any]
+    workflow_md5: Optional[str]
+    cameras_md5: Optional[str]
+    max_fps: Optional[int]
+    # pipeline_id 不参与比较, 只用于终止旧管道
+    pipeline_id: Optional[str] = field(default=None, compare=False)
+
+    @classmethod
+    def of(cls, deployment: "DeploymentModel") -> "PipelineState":
+        return cls(
+            camera_ids=[_link_id(camera) for camera in deployment.cameras],
+            workflow_id=_link_id(deployment.workflow),
+            gateway_id=_link_id(deployment.gateway),
+            parameters=copy.deepcopy(deployment.parameters),
+            workflow_md5=deployment.workflow_md5,
+            cameras_md5=deployment.cameras_md5,
+            max_fps=deployment.max_fps,
+            pipeline_id=deployment.pipeline_id,
+        )
+
+
+# 创建推理管道前并发准备视频源的最大并发数
+PREPARE_CONCURRENCY = settings.get('deployment_prepare_concurrency', 8)
+
+
+@dataclass
+class VideoSources:
+    references: List[str]
+    is_file_source: bool
+    fps: Optional[float]
+
+
 class DeploymentModel(Document):
     name: str = Field(description="部署名称")
     description: str = Field(description="部署描述")
@@ -47,8 +101,24 @@ class DeploymentModel(Document):
     created_at: datetime = Field(default_factory=datetime.now, description="创建时间")
     updated_at: datetime = Field(default_factory=datetime.now, description="更新时间")
     workspace: Link[WorkspaceModel] = Field(description="所属工作空间")
+    # 加载或保存时的管道相关字段快照, 更新时据此判断是否需要重建管道
+    _pipeline_state: Optional[PipelineState] = PrivateAttr(default=None)
+    _provision_timings: Dict[str, float] = PrivateAttr(default_factory=dict)
+
     class Settings:
         name = "deployments"
+        indexes = [
+            IndexModel([("workflow.$id", ASCENDING), ("workflow_md5", ASCENDING)], name="deployment_workflow_md5"),
+        ]
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._pipeline_state = PipelineState.of(self)
+
+    @after_event([Insert, Replace, Save])
+    def snapshot_pipeline_state(self):
+        """保存后刷新快照"""
+        self._pipeline_state = PipelineState.of(self)
     
     def __replace_spec_inputs(self, spec: Dict[str, Any]):
         """Replace spec inputs with parameters"""
@@ -72,42 +142,63 @@ class DeploymentModel(Document):
         if any(types) and not all(types):
             raise RemoteCallError("不支持文件视频和非文件视频混合部署")
     
-    async def _fetch_video_reference(self) -> List[str]:
-        """Fetch video reference"""
+    async def _prepare_camera(self, camera: CameraModel, semaphore: asyncio.Semaphore) -> Tuple[str, Optional[float]]:
+        """准备单个视频源: 文件视频签名地址并读取已持久化的探测结果"""
+        if camera.type != CameraType.FILE:
+            return camera.path, None
+        async with semaphore:
+            path = await self._video_file_to_signed_url(camera.path)
+        if camera.video_probe and camera.video_probe.path == camera.path and camera.video_probe.is_complete:
+            return path, camera.video_probe.fps
+        # 缺少探测结果时不阻塞部署，后台补充探测
+        spawn_background(camera.refresh_video_probe())
+        return path, None
+
+    async def _prepare_video_sources(self) -> VideoSources:
+        """并发准备所有视频源, 每个相机只处理一次, 并发数受 PREPARE_CONCURRENCY 限制"""
+        started = time.perf_counter()
         await self._is_all_file_source()
-        video_reference = []
-        for camera in self.cameras:
-            if camera.type == CameraType.FILE:
-                path = await self._video_file_to_signed_url(camera.path)
-            else:
-                path = camera.path
-            video_reference.append(path)
-        return video_reference
-    
-    async def _fetch_video_source_properties(self) -> Dict[str, Any]:
-        """Fetch video source properties"""
-        is_file_source, fps = False, None
-        for camera in self.cameras:
-            if camera.type == CameraType.FILE:
-                properties = await camera.get_video_info()
-                is_file_source = True
-                fps = properties.get("fps")
-        return is_file_source, fps
+        semaphore = asyncio.Semaphore(PREPARE_CONCURRENCY)
+        # 同一相机出现多次时只准备一次
+        unique = {str(camera.id): camera for camera in self.cameras}
+        results = await asyncio.gather(*[self._prepare_camera(camera, semaphore) for camera in unique.values()])
+        prepared_by_id = dict(zip(unique.keys(), results))
+        prepared = [prepared_by_id[str(camera.id)] for camera in self.cameras]
+        fps_values = [fps for _, fps in prepared if fps]
+        self._provision_timings["prepare_sources"] = round(time.perf_counter() - started, 3)
+        return VideoSources(
+            references=[path for path, _ in prepared],
+            is_file_source=any(camera.type == CameraType.FILE for camera in self.cameras),
+            fps=fps_values[-1] if fps_values else None,
+        )
+
+    async def _create_pipeline(self, pipeline_client: PipelineClient) -> str:
+        """准备视频源并在网关上创建推理管道, 记录各阶段耗时"""
+        self._provision_timings = {}
+        sources = await self._prepare_video_sources()
+        started = time.perf_counter()
+        pipeline_id = await pipeline_client.create_pipeline(
+            video_reference=sources.references,
+            workflow_spec=self.__replace_spec_inputs(self.workflow.specification),
+            workspace_name=self.workspace.name,
+            output_image_fields=self.output_image_fields,
+            max_fps=self.max_fps or sources.fps,
+            is_file_source=sources.is_file_source
+        )
+        self._provision_timings["create_pipeline"] = round(time.perf_counter() - started, 3)
+        return pipeline_id
+
+    @property
+    def provision_timings(self) -> Dict[str, float]:
+        """最近一次创建推理管道的各阶段耗时(秒)"""
+        return dict(self._provision_timings)
         
     @before_event([Insert])
     async def create_remote_pipeline(self):
         """Create inference pipeline before deployment is created"""
         try:
             pipeline_client = PipelineClient(self.gateway.get_api_url())
-            is_file_source, max_fps = await self._fetch_video_source_properties()
-            self.pipeline_id = await pipeline_client.create_pipeline(
-                video_reference=await self._fetch_video_reference(),
-                workflow_spec=self.__replace_spec_inputs(self.workflow.specification),
-                workspace_name=self.workspace.name,
-                output_image_fields=self.output_image_fields,
-                max_fps=self.max_fps or max_fps,
-                is_file_source=is_file_source
-            )
+            self.pipeline_id = await self._create_pipeline(pipeline_client)
             self.running_status = OperationStatus.PENDING
             # fetch running status after 5 seconds
             asyncio.create_task(self._delayed_fetch_running_status())
@@ -116,35 +207,19 @@ class DeploymentModel(Document):
             logger.error(f"Failed to create pipeline: {e}")
             raise RemoteCallError(f"远程创建推理管道失败")
 
-    async def handle_pipeline_update(self, old_document: "DeploymentModel"):
+    async def handle_pipeline_update(self, old_state: PipelineState):
         """Handle pipeline updates when deployment is updated"""
         try:
             pipeline_client = PipelineClient(self.gateway.get_api_url())
             
-            needs_restart = (
-                [camera.id for camera in self.cameras] != [camera.id for camera in old_document.cameras] or
-                self.workflow.id != old_document.workflow.id or
-                self.gateway.id != old_document.gateway.id or
-                self.parameters != old_document.parameters or
-                self.workflow_md5 != old_document.workflow_md5 or
-                self.cameras_md5 != old_document.cameras_md5 or
-                self.max_fps != old_document.max_fps
-            )
+            needs_restart = PipelineState.of(self) != old_state
             
             if needs_restart:
-                if old_document.pipeline_id:
-                    await pipeline_client.terminate_pipeline(old_document.pipeline_id)
-
-                is_file_source, max_fps = await self._fetch_video_source_properties() 
-                self.pipeline_id = await pipeline_client.create_pipeline(
-                    video_reference=await self._fetch_video_reference(),
-                    workflow_spec=self.__replace_spec_inputs(self.workflow.specification),
-                    workspace_name=self.workspace.name,
-                    output_image_fields=self.output_image_fields,
-                    max_fps=self.max_fps or max_fps,
-                    is_file_source=is_file_source
-                )
-                logger.info(f"Restarted pipeline for deployment: old={old_document.pipeline_id}, new={self.pipeline_id}")
+                if old_state.pipeline_id:
+                    await pipeline_client.terminate_pipeline(old_state.pipeline_id)
+
+                self.pipeline_id = await self._create_pipeline(pipeline_client)
+                logger.info(f"Restarted pipeline for deployment: old={old_state.pipeline_id}, new={self.pipeline_id}")
 
         except Exception as e:
             logger.error(f"Failed to update pipeline: {e}")
@@ -152,8 +227,11 @@ class DeploymentModel(Document):
 
     async def trigger_update(self):
         """Trigger pipeline update manually"""
-        old_document = await DeploymentModel.get(self.id, fetch_links=True)
-        await self.handle_pipeline_update(old_document)
+        old_state = self._pipeline_state
+        if old_state is None:
+            # 没有快照(如 model_construct 构造)时才回库读取旧状态
+            old_state = PipelineState.of(await DeploymentModel.get(self.id))
+        await self.handle_pipeline_update(old_state)
         await self.save()
 
     @before_event([Delete])
@@ -164,6 +242,7 @@ class DeploymentModel(Document):
                 pipeline_client = PipelineClient(self.gateway.get_api_url())
                 await pipeline_client.terminate_pipeline(self.pipeline_id)
                 logger.info(f"Terminated pipeline {self.pipeline_id}")
+            result_relays.remove(str(self.id))
         except Exception as e:
             logger.error(f"Failed to terminate pipeline: {e}")
             raise RemoteCallError(f"远程终止推理管道失败")
@@ -210,15 +289,14 @@ class DeploymentModel(Document):
             status = metrics['status']
             report = metrics['report']
 
-            self.running_status = await self.get_status(status, report)
+            running_status = await self.get_status(status, report)
             # async register metrics
             asyncio.create_task(PipelineMetricTimeSeries.register_metrics(self, report))
-            await self.save()
+            await update_document(self, {"running_status": running_status})
 
             return self.running_status
         except (requests.exceptions.ConnectionError, HTTPCallErrorError):
-            self.running_status = OperationStatus.TIMEOUT
-            await self.save()
+            await update_document(self, {"running_status": OperationStatus.TIMEOUT})
             return self.running_status
         except Exception as e:
             logger.exception(f"Failed to update deployment status: {e}")
@@ -254,13 +332,15 @@ class DeploymentModel(Document):
             logger.error(f"Failed to get pipeline metrics timerange: {e}")
             raise RemoteCallError(f"远程获取推理管道指标数据失败")
 
-    async def pause_pipeline(self) -> bool:
-        """Pause pipeline"""
+    async def pause_pipeline(self, persist: bool = True) -> bool:
+        """Pause pipeline, persist 为 False 时只修改内存状态, 由调用方批量写入"""
         pipeline_client = PipelineClient(self.gateway.get_api_url())
         success = await pipeline_client.pause_pipeline(self.pipeline_id)
         if success:
-            self.running_status = OperationStatus.MUTED
-            await self.save()
+            if persist:
+                await update_document(self, {"running_status": OperationStatus.MUTED})
+            else:
+                self.running_status = OperationStatus.MUTED
             return success
         raise RemoteCallError(f"远程暂停推理管道失败")
     
@@ -273,12 +353,14 @@ class DeploymentModel(Document):
 
         raise RemoteCallError(f"远程视频流推理管道失败")
 
-    async def resume_pipeline(self) -> bool:
-        """Resume pipeline"""
+    async def resume_pipeline(self, persist: bool = True) -> bool:
+        """Resume pipeline, persist 为 False 时只修改内存状态, 由调用方批量写入"""
         pipeline_client = PipelineClient(self.gateway.get_api_url())
         success = await pipeline_client.resume_pipeline(self.pipeline_id)
         if success:
-            self.running_status = OperationStatus.RUNNING
-            await self.save()
+            if persist:
+                await update_document(self, {"running_status": OperationStatus.RUNNING})
+            else:
+                self.running_status = OperationStatus.RUNNING
             return success
         raise RemoteCallError(f"远程恢复推理管道失败")
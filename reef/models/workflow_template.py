@@ -1,7 +1,8 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
-from pydantic import Field
-from beanie import Document, Link
+from pydantic import BaseModel, Field
+from beanie import Document, Link, PydanticObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
 from .users import UserModel
 
 class WorkflowTemplateModel(Document):
@@ -13,9 +14,87 @@ class WorkflowTemplateModel(Document):
     created_at: datetime = Field(default_factory=datetime.now, description="创建时间")
     updated_at: datetime = Field(default_factory=datetime.now, description="更新时间")
     creator: Link[UserModel] = Field(description="创建者")
+    creator_name: Optional[str] = Field(default=None, description="创建者用户名(冗余存储, 列表无需关联查询用户)")
     usage_count: int = Field(default=0, description="使用次数")
     tags: list[str] = Field(default=[], description="标签")
     roboflow_id: Optional[str] = Field(default=None, description="Roboflow ID")
 
     class Settings:
-        name = "workflow_templates" 
\ No newline at end of file
+        name = "workflow_templates"
+        indexes = [
+            IndexModel(
+                [("name", TEXT), ("description", TEXT), ("tags", TEXT)],
+                weights={"name": 10, "tags": 5, "description": 1},
+                default_language="none",
+                name="template_text",
+            ),
+            IndexModel([("tags", ASCENDING)], name="template_tags"),
+            IndexModel([("is_public", ASCENDING), ("usage_count", DESCENDING), ("_id", DESCENDING)], name="template_public_usage"),
+            IndexModel([("is_public", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="template_public_recent"),
+            IndexModel([("creator.$id", ASCENDING), ("created_at", DESCENDING)], name="template_creator"),
+        ]
+
+
+class TemplateSummary(BaseModel):
+    """模板列表投影, 不加载 specification/data 和创建者文档"""
+    id: PydanticObjectId
+    name: str
+    description: str = ""
+    is_public: bool = False
+    created_at: datetime
+    updated_at: datetime
+    creator: Any = None
+    creator_name: Optional[str] = None
+    usage_count: int = 0
+    tags: list[str] = []
+
+    class Settings:
+        projection = {
+            "id": "$_id",
+            "name": 1,
+            "description": 1,
+            "is_public": 1,
+            "created_at": 1,
+            "updated_at": 1,
+            "creator": 1,
+            "creator_name": 1,
+            "usage_count": 1,
+            "tags": 1,
+        }
+
+
+class TemplateForkStats(Document):
+    """模板复制统计, 按 (模板, 工作空间, 天) 聚合, 复制时原子 $inc 累加"""
+    template_id: PydanticObjectId = Field(description="模板ID")
+    workspace_id: PydanticObjectId = Field(description="工作空间ID")
+    day: datetime = Field(description="统计日期(当天零点)")
+    forks: int = Field(default=0, description="复制次数")
+    updated_at: datetime = Field(default_factory=datetime.now, description="更新时间")
+
+    class Settings:
+        name = "template_fork_stats"
+        indexes = [
+            IndexModel([("template_id", ASCENDING), ("day", ASCENDING), ("workspace_id", ASCENDING)], unique=True, name="fork_stats_key"),
+            IndexModel([("day", DESCENDING), ("template_id", ASCENDING)], name="fork_stats_day"),
+        ]
+
+    @classmethod
+    async def record_fork(cls, template_id: PydanticObjectId, workspace_id: PydanticObjectId) -> None:
+        now = datetime.now()
+        day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        await cls.get_motor_collection().update_one(
+            {"template_id": template_id, "day": day, "workspace_id": workspace_id},
+            {"$inc": {"forks": 1}, "$set": {"updated_at": now}},
+            upsert=True
+        )
+
+    @classmethod
+    async def top_templates(cls, since: datetime, limit: int = 20) -> List[Tuple[PydanticObjectId, int]]:
+        """统计区间内复制次数最多的模板, 返回 [(模板ID, 复制次数)]"""
+        rows = await cls.get_motor_collection().aggregate([
+            {"$match": {"day": {"$gte": since}}},
+            {"$group": {"_id": "$template_id", "forks": {"$sum": "$forks"}}},
+            {"$sort": {"forks": -1, "_id": -1}},
+            {"$limit": limit},
+        ]).to_list(length=limit)
+        return [(row["_id"], row["forks"]) for row in rows]
@@ -1,19 +1,135 @@
+import json
+import hashlib
 from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
-from pydantic import Field
-from beanie import Document, Link
+from pydantic import BaseModel, Field
+from beanie import Document, Link, PydanticObjectId
 from .workspaces import WorkspaceModel
 from .users import UserModel
 
 
 
+def make_specification(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """由画布节点生成工作流定义"""
+    if not data:
+        return None
+    inputs, steps, outputs = [], [], []
+    for node in data.get("nodes", []):
+        identifier = node["data"]["manifest_type_identifier"]
+        form_data = node["data"]["formData"]
+        if identifier == "input":
+            inputs.extend({"name": image["name"], "type": "WorkflowImage"} for image in form_data.get("sources", []))
+            inputs.extend({
+                "name": param["name"],
+                "type": "WorkflowParameter",
+                "default_value": param["value"],
+            } for param in form_data.get("params", []))
+        elif identifier == "output":
+            outputs.extend({
+                "type": "JsonField",
+                "name": output["name"],
+                "selector": output["selector"],
+            } for output in form_data["params"])
+        else:
+            steps.append(form_data)
+    return {"version": "v1", "inputs": inputs, "steps": steps, "outputs": outputs}
+
+
+def calc_specification_md5(specification: Optional[Dict[str, Any]]) -> Optional[str]:
+    if specification is None:
+        return None
+    spec_str = json.dumps(specification, sort_keys=True, ensure_ascii=False)
+    return hashlib.md5(spec_str.encode('utf-8')).hexdigest()
+
+
+def extract_input_params(specification: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """工作流的参数输入列表"""
+    return [
+        {"name": item["name"], "default_value": item.get("default_value")}
+        for item in (specification or {}).get("inputs", [])
+        if item["type"] == "WorkflowParameter"
+    ]
+
+
+def extract_output_image_fields(data: Optional[Dict[str, Any]], specification: Optional[Dict[str, Any]]) -> List[str]:
+    """输出中指向图像类型字段的输出名称列表"""
+    if not data or not specification:
+        return []
+    # 节点名称 -> 图像输出字段名称
+    image_fields = {}
+    for node in data.get("nodes", []):
+        node_name = node["data"]["formData"].get("name", "")
+        if not node_name:
+            continue
+        for output in node["data"].get("outputs_manifest", []):
+            if any(kind.get("internal_data_type") == "WorkflowImageData" for kind in output.get("kind", [])):
+                image_fields[node_name] = output["name"]
+                break
+
+    output_image_fields = []
+    for output in specification.get("outputs", []):
+        selector = output["selector"].split(".")
+        if len(selector) == 3 and image_fields.get(selector[1], "") == selector[2]:
+            output_image_fields.append(output["name"])
+    return output_image_fields
+
+
+def compile_workflow(data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """由 data 编译出的派生字段"""
+    specification = make_specification(data) or {}
+    return {
+        "specification": specification,
+        "specification_md5": calc_specification_md5(specification),
+        "output_image_fields": extract_output_image_fields(data, specification),
+        "input_params": extract_input_params(specification),
+    }
+
+
+def workflow_etag(specification_md5: Optional[str], updated_at: datetime, workspace_name: Optional[str]) -> str:
+    """工作流的 ETag, 定义、任何字段或所属工作空间名称(详情中的关联字段)更新后都会变化"""
+    key = f"{specification_md5}:{updated_at.isoformat()}:{workspace_name}"
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+class WorkflowSummary(BaseModel):
+    """工作流摘要投影, 不加载 data/specification"""
+    id: PydanticObjectId
+    name: str
+    description: Optional[str] = None
+    specification_md5: Optional[str] = None
+    node_count: int = 0
+    created_at: datetime
+    updated_at: datetime
+    # 所属工作空间的 DBRef, 工作空间名称不在投影中, 由查询方补充
+    workspace: Optional[Any] = None
+    workspace_name: Optional[str] = None
+
+    class Settings:
+        projection = {
+            "id": "$_id",
+            "name": 1,
+            "description": 1,
+            "specification_md5": 1,
+            "node_count": {"$size": {"$ifNull": ["$data.nodes", []]}},
+            "created_at": 1,
+            "updated_at": 1,
+            "workspace": 1,
+        }
+
+    @property
+    def etag(self) -> str:
+        return workflow_etag(self.specification_md5, self.updated_at, self.workspace_name)
+
+
 class WorkflowModel(Document):
     name: str = Field(description="工作流名称")
     description: str = Field(description="工作流描述")
     roboflow_id: Optional[str] = Field(default=None, description="Roboflow ID")
     data: Optional[Dict[str, Any]] = Field(default=None, description="工作流数据")
-    specification: Dict[str, Any] = Field(description="工作流定义")
+    specification: Dict[str, Any] = Field(default_factory=dict, description="工作流定义")
     specification_md5: Optional[str] = Field(default=None, description="specification 的 md5")
+    output_image_fields: Optional[List[str]] = Field(default=None, description="输出图像字段列表, 写入时编译")
+    input_params: Optional[List[Dict[str, Any]]] = Field(default=None, description="参数输入列表, 写入时编译")
     created_at: datetime = Field(default_factory=datetime.now, description="创建时间")
     updated_at: datetime = Field(default_factory=datetime.now, description="更新时间")
     workspace: Link[WorkspaceModel] = Field(description="所属工作空间")
@@ -22,43 +138,26 @@ class WorkflowModel(Document):
     class Settings:
         name = "workflows"
 
+    @property
+    def etag(self) -> str:
+        """需要已加载 workspace 关联"""
+        return workflow_etag(self.specification_md5, self.updated_at, self.workspace.name)
+
+    def compile(self) -> None:
+        """由 data 编译工作流定义及派生数据，只在写入 data 时调用"""
+        for key, value in compile_workflow(self.data).items():
+            setattr(self, key, value)
+
     async def get_output_image_fields(self) -> List[str]:
         """Get the output image fields of the workflow."""
-        def _extract_image_fields_from_node(node: Dict[str, Any]) -> Optional[Tuple[str, str]]:
-            """从节点中提取图像字段信息
-            
-            Args:
-                node: 工作流节点数据
-                
-            Returns:
-                节点名称和对应的图像字段名称的元组,如果没有图像字段则返回 None
-            """
-            node_name = node["data"]["formData"].get("name", "")
-            for output in node["data"].get("outputs_manifest", []):
-                for kind_item in output.get("kind", []):
-                    if node_name and kind_item.get("internal_data_type") == "WorkflowImageData":
-                        return node_name, output["name"]
-            return None
-            
-        def _build_image_fields_mapper() -> Dict[str, str]:
-            """构建节点名称到图像字段的映射
-            
-            Returns:
-                节点名称到图像字段名称的映射字典
-            """
-            mapper = {}
-            for node in self.data["nodes"]:
-                result = _extract_image_fields_from_node(node)
-                if result:
-                    node_name, field_name = result
-                    mapper[node_name] = field_name
-            return mapper
-            
-        output_image_fields = []
-        image_fields_mapper = _build_image_fields_mapper()
-        selectors = {output["name"]: output["selector"].split(".") for output in self.specification["outputs"]}
-        for output_name, selector in selectors.items():
-            _, node_name, field_name = selector
-            if image_fields_mapper.get(node_name, "") == field_name:
-                output_image_fields.append(output_name)
-        return output_image_fields
\ No newline at end of file
+        if self.output_image_fields is None:
+            # 历史数据没有编译结果，补算一次并回写
+            self.output_image_fields = extract_output_image_fields(self.data, self.specification)
+            await self.set({WorkflowModel.output_image_fields: self.output_image_fields})
+        return self.output_image_fields
+
+    def get_input_params(self) -> List[Dict[str, Any]]:
+        """Get the parameter inputs of the workflow."""
+        if self.input_params is None:
+            return extract_input_params(self.specification)
+        return self.input_params
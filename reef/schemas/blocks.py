@@ -76,3 +76,15 @@ class BlockTranslationSync(BaseModel):
     """区块翻译同步请求模型"""
     source_url: str = "https://detect.roboflow.com/workflows/blocks/describe"
     language: Language = Language.ZH
+    dry_run: bool = Field(default=False, description="只计算差异，不写入数据库")
+
+class BlockTranslationSyncReport(BaseModel):
+    """区块翻译同步报告"""
+    total: int = Field(description="源数据区块数")
+    inserted: int = Field(description="新增数")
+    updated: int = Field(description="更新数")
+    unchanged: int = Field(description="未变化数")
+    dry_run: bool = Field(description="是否为演练模式")
+    fetch_seconds: float = Field(description="拉取源数据耗时(秒)")
+    diff_seconds: float = Field(description="计算差异耗时(秒)")
+    write_seconds: float = Field(description="写入耗时(秒)")
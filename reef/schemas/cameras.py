@@ -10,6 +10,7 @@ class CameraBase(BaseModel):
     description: str = Field(description="相机描述")
     type: CameraType = Field(description="相机类型")
     path: Union[str, int] = Field(description="相机路径")
+    keep_warm: bool = Field(default=False, description="是否常驻取流")
 
 
 class CameraCreate(CameraBase):
@@ -19,6 +20,7 @@ class CameraCreate(CameraBase):
 class CameraUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
+    keep_warm: Optional[bool] = None
 
 
 class CameraVideoInfo(BaseModel):
@@ -45,6 +47,8 @@ class CameraWebRTCStreamRequest(BaseModel):
     webrtc_offer: WebRTCOffer = Field(description="WebRTC offer信息")
     webrtc_turn_config: Optional[WebRTCTURNConfig] = None
     fps: Optional[float] = Field(default=30, description="视频帧率")
+    width: Optional[int] = Field(default=None, gt=0, description="输出视频宽度, 为空时按高度等比缩放或保持原始分辨率")
+    height: Optional[int] = Field(default=None, gt=0, description="输出视频高度, 为空时按宽度等比缩放或保持原始分辨率")
     processing_timeout: Optional[float] = Field(default=0.1, description="处理超时时间")
     max_consecutive_timeouts: Optional[int] = Field(default=30, description="最大连续超时次数")
     min_consecutive_on_time: Optional[int] = Field(default=5, description="最小连续正常时间")
@@ -85,6 +89,7 @@ class CameraResponse(CameraBase):
             description=db.description, 
             type=db.type, 
             path=db.path, 
+            keep_warm=db.keep_warm,
             gateway_id=str(db.gateway.id) if db.gateway else None, 
             gateway_name=db.gateway.name if db.gateway else None,
             workspace_id=str(db.workspace.id), 
@@ -1,6 +1,7 @@
+from enum import Enum
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 from reef.models.deployments import OperationStatus, DeploymentModel
 
@@ -67,6 +68,75 @@ class DeploymentResponse(DeploymentBase):
             updated_at=db.updated_at
         )
 
+class BulkAction(str, Enum):
+    PAUSE = "pause"
+    RESUME = "resume"
+    RESTART = "restart"
+    DELETE = "delete"
+
+
+class DeploymentBulkRequest(BaseModel):
+    """批量操作: 指定部署ID列表, 或按网关/工作流/状态过滤"""
+    action: BulkAction
+    deployment_ids: Optional[List[str]] = Field(default=None, max_length=500, description="部署ID列表")
+    gateway_id: Optional[str] = Field(default=None, description="按网关过滤")
+    workflow_id: Optional[str] = Field(default=None, description="按工作流过滤")
+    running_status: Optional[OperationStatus] = Field(default=None, description="按运行状态过滤")
+
+    @model_validator(mode='after')
+    def validate_selector(self):
+        if self.deployment_ids is None and not (self.gateway_id or self.workflow_id or self.running_status):
+            raise ValueError("需要指定部署ID列表或过滤条件")
+        return self
+
+
+class BulkItemResult(BaseModel):
+    deployment_id: str
+    name: Optional[str] = None
+    success: bool
+    message: str
+
+
+class BulkOperationResult(BaseModel):
+    action: BulkAction
+    total: int
+    succeeded: int
+    failed: int
+    items: List[BulkItemResult]
+
+
+class RolloutRequest(BaseModel):
+    """工作流变更后分批重启受影响的部署"""
+    batch_size: int = Field(default=10, ge=1, le=200, description="每批重启的部署数")
+    gateway_concurrency: int = Field(default=2, ge=1, le=32, description="同一网关上的最大并发重启数")
+    wave_interval: float = Field(default=5, ge=0, le=600, description="两批之间的间隔(秒)")
+    stop_on_failure: bool = Field(default=False, description="某一批有失败时停止后续批次")
+
+
+class RolloutStatus(str, Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+    STOPPED = "stopped"
+    FAILED = "failed"
+
+
+class RolloutProgress(BaseModel):
+    id: str
+    workflow_id: str
+    specification_md5: Optional[str] = None
+    status: RolloutStatus = RolloutStatus.RUNNING
+    total: int = 0
+    completed: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    current_wave: int = 0
+    total_waves: int = 0
+    message: Optional[str] = None
+    started_at: datetime = Field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
+    items: List[BulkItemResult] = []
+
+
 class DeploymentDiffResponse(BaseModel):
     workflow_changed: bool
     cameras_changed: bool
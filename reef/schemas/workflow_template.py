@@ -1,3 +1,4 @@
+from enum import Enum
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
@@ -33,11 +34,27 @@ class TemplateResponse(TemplateBase):
             usage_count=template.usage_count,
             tags=template.tags,
             creator={
-                "id": str(template.creator.id),
-                "username": template.creator.username
+                # creator 可能是已关联的用户文档, 也可能是未关联的 Link/DBRef
+                "id": str(getattr(template.creator, "ref", template.creator).id),
+                "username": template.creator_name or getattr(template.creator, "username", None)
             }
         )
 
+
+class PopularTemplateResponse(BaseModel):
+    template: TemplateResponse = Field(..., description="模板")
+    recent_forks: int = Field(..., description="统计区间内的复制次数")
+
+
+class TemplateSort(str, Enum):
+    USAGE = "usage"
+    RECENT = "recent"
+
+
+class TemplateCursorResponse(BaseModel):
+    items: List[TemplateResponse] = Field(..., description="模板列表")
+    next_cursor: Optional[str] = Field(default=None, description="下一页游标, 为空表示没有更多")
+
 class TemplatePublish(BaseModel):
     name: str = Field(..., description="模板名称")
     description: str = Field(..., description="模板描述")
@@ -49,6 +66,7 @@ class WorkflowSync(BaseModel):
     workflow_id: str = Field(..., description="Roboflow workflow id")
     project_id: Optional[str] = Field(default=None, description="Roboflow project id")
     api_key: Optional[str] = Field(default=None, description="Roboflow API key")
+    version: Optional[str] = Field(default=None, description="Roboflow workflow 版本, 为空时同步最新版本")
 
 
 class TemplateFork(BaseModel):
@@ -4,10 +4,8 @@ from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, Field
 
 from pydantic import model_validator
-from reef.models.workflows import WorkflowModel
+from reef.models.workflows import WorkflowModel, WorkflowSummary
 from reef.exceptions import ValidationError
-import hashlib
-import json
 
 class InputParamsType(str, Enum):
     workflow_image = "WorkflowImage"
@@ -25,6 +23,7 @@ class WorkflowData(BaseModel):
 
 
 class WorkflowBase(BaseModel):
+    """specification 等派生数据在写入时由 WorkflowModel.compile 生成，请求中传入的值会被忽略"""
     name: Optional[str] = Field(default=None, description="工作流名称")
     description: Optional[str] = Field(default=None, description="工作流描述")
     specification: Optional[WorkflowSpecification] = Field(default=None, description="工作流定义")
@@ -35,69 +34,7 @@ class WorkflowBase(BaseModel):
     def validate_data(self):
         if self.data is None:
             raise ValidationError("参数data不能同时为空!")
-        self.specification = self.make_specification(self.data)
-        self.specification_md5 = self._calc_specification_md5(self.specification)
         return self
-    
-    @classmethod
-    def make_specification(cls, data: Optional[WorkflowData] = None):
-        if data is None:
-            return {}
-        inputs, steps, outputs = [], [], []
-        for node in data.nodes:
-            if node["data"]["manifest_type_identifier"] == "input":
-                inputs.extend(cls._handle_input_node(node))
-            elif node["data"]["manifest_type_identifier"] == "output":
-                outputs.extend(cls._handle_output_node(node))
-            else:
-                steps.append(node["data"]["formData"])
-        return WorkflowSpecification(
-            version="v1",
-            inputs=inputs,
-            steps=steps,
-            outputs=outputs,
-        )
-
-    @classmethod
-    def _handle_input_node(cls, node: Dict[str, Any]):
-        inputs = []
-        # Handle list of form data for input type
-        form_data = node["data"]["formData"]
-        images = form_data.get("sources", [])
-        params = form_data.get("params", [])
-            
-        for image in images:
-            inputs.append({
-                "name": image["name"],
-                "type": InputParamsType.workflow_image.value,
-            })
-        for param in params:
-            inputs.append({
-                "name": param["name"],
-                "type": InputParamsType.workflow_parameter.value,
-                "default_value": param["value"],
-            })
-        return inputs
-
-    @classmethod
-    def _handle_output_node(cls, node: Dict[str, Any]):
-        outputs = []
-        form_data = node["data"]["formData"]["params"]
-        for output in form_data:
-            outputs.append({
-                "type": "JsonField",
-                "name": output["name"],
-                "selector": output["selector"],
-            })
-        return outputs
-
-    @staticmethod
-    def _calc_specification_md5(specification: Optional[WorkflowSpecification]) -> Optional[str]:
-        if specification is None:
-            return None
-        spec_dict = specification.model_dump() if isinstance(specification, WorkflowSpecification) else specification
-        spec_str = json.dumps(spec_dict, sort_keys=True, ensure_ascii=False)
-        return hashlib.md5(spec_str.encode('utf-8')).hexdigest()
 
 class WorkflowCreate(WorkflowBase):
     pass
@@ -116,6 +53,8 @@ class WorkflowResponse(WorkflowBase):
     updated_at: datetime
     workspace_id: str
     workspace_name: str
+    output_image_fields: Optional[List[str]] = Field(default=None, description="输出图像字段列表")
+    input_params: Optional[List[Dict[str, Any]]] = Field(default=None, description="参数输入列表")
 
     @classmethod
     def db_to_schema(cls, workflow: WorkflowModel):
@@ -124,10 +63,36 @@ class WorkflowResponse(WorkflowBase):
             name=workflow.name,
             description=workflow.description,
             data=workflow.data,
-            specification=workflow.specification,
+            specification=workflow.specification or None,
             specification_md5=workflow.specification_md5,
+            output_image_fields=workflow.output_image_fields,
+            input_params=workflow.get_input_params(),
             created_at=workflow.created_at,
             updated_at=workflow.updated_at,
             workspace_id=str(workflow.workspace.id),
             workspace_name=workflow.workspace.name,
         )
+
+
+class WorkflowSummaryResponse(BaseModel):
+    id: str
+    name: str
+    description: Optional[str] = None
+    specification_md5: Optional[str] = None
+    node_count: int = Field(description="节点数量")
+    etag: str = Field(description="工作流详情的 ETag, 可用于 If-None-Match")
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def db_to_schema(cls, summary: WorkflowSummary):
+        return cls(
+            id=str(summary.id),
+            name=summary.name,
+            description=summary.description,
+            specification_md5=summary.specification_md5,
+            node_count=summary.node_count,
+            etag=summary.etag,
+            created_at=summary.created_at,
+            updated_at=summary.updated_at,
+        )
@@ -1,5 +1,15 @@
+import asyncio
 import urllib.parse
-from typing import List, Tuple, Dict
+from datetime import datetime
+from typing import Any, Coroutine, List, Set, Tuple, Dict
+
+from loguru import logger
+from beanie.odm.fields import LinkTypes
+from beanie.odm.utils.encoder import Encoder
+
+
+# 后台任务的强引用, 事件循环只弱引用任务, 不保存可能在执行中被回收
+_background_tasks: Set[asyncio.Task] = set()
 
 
 def _add_params_to_url(url: str, params: List[Tuple[str, str]]) -> str:
@@ -11,6 +21,58 @@ def _add_params_to_url(url: str, params: List[Tuple[str, str]]) -> str:
     parameters_string = "&".join(params_chunks)
     return f"{url}?{parameters_string}"
 
+def spawn_background(coro: Coroutine) -> asyncio.Task:
+    """创建后台任务并保留引用直到完成, 异常记录到日志"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_background_done)
+    return task
+
+
+def _on_background_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.opt(exception=task.exception()).error(f"后台任务失败: {task.get_coro().__qualname__}")
+
+
 def class_colors_to_hex(class_mapping: Dict[str, str]) -> Dict[str, str]:
     return {k: f"#{format(hash(k) % 0xFFFFFF, '06x')}" for k in class_mapping.values()}
 
+
+
+def _encode_fields(document, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """只编码给定字段为落库格式, 规则与 beanie 编码整个文档时一致(Link -> DBRef, Enum -> 值等)"""
+    link_fields = document.get_link_fields() or {}
+    model_fields = type(document).model_fields
+    encoder = Encoder(custom_encoders=document.get_settings().bson_encoders, to_db=True)
+    encoded = {}
+    for key, value in fields.items():
+        if key in link_fields and value is not None:
+            link_type = link_fields[key].link_type
+            if link_type in (LinkTypes.DIRECT, LinkTypes.OPTIONAL_DIRECT):
+                value = value.to_ref()
+            elif link_type in (LinkTypes.LIST, LinkTypes.OPTIONAL_LIST):
+                value = [link.to_ref() for link in value]
+        field_info = model_fields.get(key)
+        encoded[(field_info and field_info.alias) or key] = encoder.encode(value)
+    return encoded
+
+
+async def update_document(document, fields: Dict[str, Any], touch: bool = True) -> Dict[str, Any]:
+    """部分更新文档: 只对发生变化的字段执行 $set, 写入成功后同步到内存对象
+
+    不会整体替换文档(Link 字段和大字段不会被重写), 也只编码变化的字段。没有变化时不访问数据库。
+    touch 为 True 且文档有 updated_at 字段时一并更新。返回实际写入的字段。
+    """
+    changed = {key: value for key, value in fields.items() if getattr(document, key) != value}
+    if not changed:
+        return changed
+    if touch and 'updated_at' in type(document).model_fields:
+        changed['updated_at'] = datetime.now()
+    await document.get_motor_collection().update_one(
+        {"_id": document.id},
+        {"$set": _encode_fields(document, changed)}
+    )
+    for key, value in changed.items():
+        setattr(document, key, value)
+    return changed
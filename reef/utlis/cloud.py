@@ -6,6 +6,7 @@ from asyncer import asyncify
 
 from reef.config import settings
 from reef.utlis.cache import url_cache
+from reef.utlis.instrumentation import instrumented
 from reef.exceptions import RemoteCallError
 
 
@@ -41,6 +42,15 @@ async def sign_url(key: str, expires: int = 3600) -> str:
     return signed_url
 
 
+@instrumented("oss")
+async def get_object_etag(key: str) -> str:
+    """获取OSS对象的ETag, 对象内容变化时ETag随之变化"""
+    bucket = get_bucket()
+    meta = await asyncify(bucket.get_object_meta)(key)
+    return meta.etag
+
+
+@instrumented("oss")
 async def backup_remote_url(key: str, url: str) -> str:
     response = await asyncify(requests.get)(url, timeout=60)
     if response.status_code != 200:
@@ -50,12 +60,14 @@ async def backup_remote_url(key: str, url: str) -> str:
     return key
 
 
+@instrumented("oss")
 async def upload_data_to_cloud(data: Union[str, bytes], key: str) -> str:
     bucket = get_bucket()
     await asyncify(bucket.put_object)(key=key, data=data)
     return key
 
 
+@instrumented("oss")
 async def transfer_object(source_key: str, target_key: str) -> None:
     bucket = get_bucket()
     if bucket.object_exists(source_key):
@@ -69,6 +81,7 @@ async def transfer_object(source_key: str, target_key: str) -> None:
         raise RemoteCallError(f"源对象不存在: {source_key}")
 
 
+@instrumented("oss")
 async def download_from_cloud(key: str) -> bytes:
     """从OSS下载文件内容
 
@@ -0,0 +1,131 @@
+"""响应压缩中间件 (gzip / brotli)"""
+import gzip
+from typing import Optional, Tuple
+
+import anyio.to_thread
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from reef.config import settings
+
+
+# 小于该大小(字节)的响应不压缩
+COMPRESSION_MINIMUM_SIZE = settings.get('compression_minimum_size', 1024)
+# 大于该大小(字节)的响应在线程中压缩, 避免阻塞事件循环
+COMPRESSION_THREAD_THRESHOLD = settings.get('compression_thread_threshold', 256 * 1024)
+# 允许压缩的 Content-Type 前缀
+COMPRESSION_TYPES = tuple(settings.get('compression_types', [
+    'application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript', 'image/svg+xml',
+]))
+GZIP_LEVEL = settings.get('compression_gzip_level', 6)
+BROTLI_QUALITY = settings.get('compression_brotli_quality', 5)
+
+
+def select_encoding(accept_encoding: str) -> Optional[str]:
+    """按 Accept-Encoding 选择编码, 优先 brotli"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        q = params.strip().removeprefix("q=")
+        try:
+            if q and float(q) == 0:
+                continue
+        except ValueError:
+            pass
+        accepted.add(name.strip().lower())
+    if "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """按大小阈值和 Content-Type 白名单压缩响应
+
+    只压缩一次性发送的响应体; 流式响应(SSE、multipart 等)和已设置 Content-Encoding 的响应原样透传。
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+                 thread_threshold: int = COMPRESSION_THREAD_THRESHOLD,
+                 content_types: Tuple[str, ...] = COMPRESSION_TYPES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_threshold = thread_threshold
+        self.content_types = content_types
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = select_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def should_compress(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").lower()
+        return content_type.startswith(self.content_types)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start: Optional[Message] = None
+        # None: 未决定; True: 压缩; False: 透传
+        self.compressing: Optional[bool] = None
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            self.compressing = None if self.middleware.should_compress(Headers(raw=message["headers"])) else False
+            if self.compressing is False:
+                await self._send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.compressing is False:
+            await self._send(message)
+            return
+
+        if self.compressing is True:
+            # 已决定压缩后不会再收到后续 body (只压缩一次性响应体)
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        if message.get("more_body", False) or len(body) < self.middleware.minimum_size:
+            # 流式响应或过小的响应体原样发送
+            self.compressing = False
+            await self._send(self.start)
+            await self._send(message)
+            return
+
+        if len(body) >= self.middleware.thread_threshold:
+            compressed = await anyio.to_thread.run_sync(compress, body, self.encoding)
+        else:
+            compressed = compress(body, self.encoding)
+
+        self.compressing = True
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers["Content-Length"] = str(len(compressed))
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # 压缩后的表示与原始字节不同, 改为弱 ETag
+            headers["ETag"] = f"W/{etag}"
+        await self._send(self.start)
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": False})
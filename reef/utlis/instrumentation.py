@@ -0,0 +1,234 @@
+"""请求耗时与热点路径埋点
+
+- InstrumentationMiddleware: 按路由模板记录请求耗时直方图, 并在响应头写入 Server-Timing
+- MongoCommandListener: 通过 Motor 的命令监听记录每种命令的次数和耗时, 并累加到当前请求
+- instrumented: 记录网关/OSS/Roboflow 等外部调用的耗时
+- render_prometheus: 以 Prometheus 文本格式导出以上指标
+"""
+import time
+import threading
+import functools
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from pymongo import monitoring
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from reef.utlis.metrics import Histogram
+
+
+T = TypeVar("T")
+
+
+class RequestTiming:
+    """单个请求内的数据库与外部调用累计耗时, Mongo 监听在驱动线程中回调, 需要加锁"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.db_count = 0
+        self.db_seconds = 0.0
+        self.ext_count = 0
+        self.ext_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_db(self, seconds: float) -> None:
+        with self._lock:
+            self.db_count += 1
+            self.db_seconds += seconds
+
+    def add_ext(self, seconds: float) -> None:
+        with self._lock:
+            self.ext_count += 1
+            self.ext_seconds += seconds
+
+    def server_timing(self) -> str:
+        total = (time.perf_counter() - self.started_at) * 1000
+        with self._lock:
+            return (
+                f'app;dur={total:.1f}, '
+                f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_count} queries", '
+                f'ext;dur={self.ext_seconds * 1000:.1f};desc="{self.ext_count} calls"'
+            )
+
+
+_request_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+# 外部调用嵌套时(如 pause_pipeline 内部查询 pipeline_ids), 只有最外层计入请求的 ext 耗时
+_in_outbound: ContextVar[bool] = ContextVar("in_outbound", default=False)
+
+
+class LabeledHistograms:
+    """按标签分组的直方图及失败计数"""
+
+    def __init__(self, label_names: Tuple[str, ...]):
+        self.label_names = label_names
+        self._histograms: Dict[Tuple[str, ...], Histogram] = {}
+        self._failures: Dict[Tuple[str, ...], int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], seconds: float, failed: bool = False) -> None:
+        histogram = self._histograms.get(labels)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(labels, Histogram())
+        histogram.observe(seconds)
+        if failed:
+            with self._lock:
+                self._failures[labels] = self._failures.get(labels, 0) + 1
+
+    def items(self) -> List[Tuple[Dict[str, str], Dict[str, object], int]]:
+        with self._lock:
+            entries = list(self._histograms.items())
+            failures = dict(self._failures)
+        return [
+            (dict(zip(self.label_names, labels)), histogram.snapshot(), failures.get(labels, 0))
+            for labels, histogram in entries
+        ]
+
+
+route_latency = LabeledHistograms(("method", "route", "status"))
+mongo_commands = LabeledHistograms(("command",))
+outbound_calls = LabeledHistograms(("target", "operation"))
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Mongo 命令计数与耗时, 注册到 AsyncIOMotorClient(event_listeners=...)
+
+    Motor 在线程池中执行驱动调用时会复制 contextvars, 因此回调中可以取到发起命令的请求。
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._record(event.command_name, event.duration_micros / 1e6, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._record(event.command_name, event.duration_micros / 1e6, failed=True)
+
+    @staticmethod
+    def _record(command: str, seconds: float, failed: bool) -> None:
+        mongo_commands.observe((command,), seconds, failed)
+        timing = _request_timing.get()
+        if timing is not None:
+            timing.add_db(seconds)
+
+
+mongo_listener = MongoCommandListener()
+
+
+def instrumented(target: str, operation: Optional[str] = None):
+    """记录异步外部调用的耗时, target 为 gateway/oss/roboflow 等"""
+
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        name = operation or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            outermost = not _in_outbound.get()
+            token = _in_outbound.set(True)
+            started_at = time.perf_counter()
+            failed = True
+            try:
+                result = await func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                seconds = time.perf_counter() - started_at
+                _in_outbound.reset(token)
+                outbound_calls.observe((target, name), seconds, failed)
+                timing = _request_timing.get()
+                if timing is not None and outermost:
+                    timing.add_ext(seconds)
+
+        return wrapper
+
+    return decorator
+
+
+class InstrumentationMiddleware:
+    """按路由模板记录请求耗时, 响应头附带 Server-Timing (app 总耗时 / db / ext)"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = _request_timing.set(timing)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("Server-Timing", timing.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_timing.reset(token)
+            # 使用路由模板作为标签, 避免路径参数导致标签基数膨胀
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            route_latency.observe(
+                (scope["method"], route, f"{status_code // 100}xx"),
+                time.perf_counter() - timing.started_at,
+            )
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _render_histogram(lines: List[str], name: str, labels: Dict[str, Any], snapshot: Dict[str, Any]) -> None:
+    for le, count in snapshot["buckets"].items():
+        lines.append(f"{name}_bucket{_format_labels({**labels, 'le': le})} {count}")
+    lines.append(f"{name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {snapshot['count']}")
+    lines.append(f"{name}_sum{_format_labels(labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+
+
+def _render_labeled(lines: List[str], name: str, help_text: str, histograms: LabeledHistograms) -> None:
+    lines.append(f"# HELP {name}_seconds {help_text}")
+    lines.append(f"# TYPE {name}_seconds histogram")
+    entries = histograms.items()
+    for labels, snapshot, _ in entries:
+        _render_histogram(lines, f"{name}_seconds", labels, snapshot)
+    lines.append(f"# TYPE {name}_failures_total counter")
+    for labels, _, failures in entries:
+        lines.append(f"{name}_failures_total{_format_labels(labels)} {failures}")
+
+
+def render_prometheus(executors: Dict[str, Dict[str, Any]], relays: Dict[str, Dict[str, Any]]) -> str:
+    """导出 Prometheus 文本格式, executors 为 executors_metrics(), relays 为 result_relays.stats()"""
+    lines: List[str] = []
+    _render_labeled(lines, "reef_http_request", "HTTP 请求耗时(按路由模板)", route_latency)
+    _render_labeled(lines, "reef_mongo_command", "Mongo 命令耗时", mongo_commands)
+    _render_labeled(lines, "reef_outbound_call", "外部调用耗时(网关/OSS/Roboflow)", outbound_calls)
+
+    lines.append("# TYPE reef_media_executor gauge")
+    for executor, metrics in executors.items():
+        for key, value in metrics.items():
+            if isinstance(value, (int, float)):
+                lines.append(f'reef_media_executor{_format_labels({"executor": executor, "stat": key})} {value}')
+    for key in ("wait_seconds", "run_seconds"):
+        lines.append(f"# TYPE reef_media_executor_{key} histogram")
+        for executor, metrics in executors.items():
+            if key in metrics:
+                _render_histogram(lines, f"reef_media_executor_{key}", {"executor": executor}, metrics[key])
+
+    lines.append("# TYPE reef_result_relay gauge")
+    for deployment_id, stats in relays.items():
+        for key in ("running", "buffered", "last_seq"):
+            lines.append(f'reef_result_relay{_format_labels({"deployment": deployment_id, "stat": key})} {int(stats[key])}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,133 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from loguru import logger
+
+from reef.config import settings
+from reef.exceptions import RemoteCallError
+from reef.utlis.metrics import Histogram
+
+
+T = TypeVar("T")
+
+# 媒体线程池大小
+MEDIA_WORKERS = settings.get('media_executor_workers', 8)
+# 排队上限，超过后直接拒绝，避免请求无限堆积
+MEDIA_MAX_QUEUE = settings.get('media_executor_max_queue', 64)
+# 单次调用默认超时(秒)
+MEDIA_TIMEOUT = settings.get('media_executor_timeout', 15)
+# WebRTC 帧转换专用线程池, 与取流/探测等阻塞 I/O 隔离, 避免不可达的相机占满线程导致直播卡顿
+FRAME_WORKERS = settings.get('frame_executor_workers', 2)
+FRAME_MAX_QUEUE = settings.get('frame_executor_max_queue', 16)
+FRAME_TIMEOUT = settings.get('frame_executor_timeout', 1)
+
+
+class MediaExecutor:
+    """OpenCV/PyAV 阻塞调用专用的有界线程池
+
+    所有媒体相关的阻塞调用都应通过 run 执行，保证事件循环不被单个慢速视频源卡住。
+    线程无法被强制中断，超时后调用方立即返回，工作线程执行完毕后自行释放。
+    """
+
+    def __init__(
+        self,
+        max_workers: int = MEDIA_WORKERS,
+        max_queue: int = MEDIA_MAX_QUEUE,
+        timeout: float = MEDIA_TIMEOUT,
+        name: str = "media"
+    ):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._rejected = 0
+        self._wait_latency = Histogram()
+        self._run_latency = Histogram()
+
+    def _dequeue(self) -> None:
+        with self._lock:
+            self._queued -= 1
+
+    def _wrap(self, func: Callable[..., T], args: tuple, kwargs: dict, submitted_at: float) -> T:
+        started_at = time.monotonic()
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+        self._wait_latency.observe(started_at - submitted_at)
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self._failed += 1
+            raise
+        else:
+            with self._lock:
+                self._completed += 1
+            return result
+        finally:
+            self._run_latency.observe(time.monotonic() - started_at)
+            with self._lock:
+                self._active -= 1
+
+    async def run(self, func: Callable[..., T], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> T:
+        """在媒体线程池中执行阻塞调用，超时抛出 RemoteCallError"""
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._rejected += 1
+                raise RemoteCallError("媒体处理繁忙，请稍后重试", status_code=503)
+            self._queued += 1
+        try:
+            future = self._executor.submit(self._wrap, func, args, kwargs, time.monotonic())
+        except BaseException:
+            self._dequeue()
+            raise
+        # 尚未开始执行就被取消的任务(超时或调用方取消)需要出队
+        future.add_done_callback(lambda f: f.cancelled() and self._dequeue())
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            future.cancel()
+            logger.warning(f"媒体调用超时: {getattr(func, '__name__', func)}")
+            raise RemoteCallError("媒体处理超时", status_code=504)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._queued,
+                "active": self._active,
+                "completed": self._completed,
+                "failed": self._failed,
+                "timeouts": self._timeouts,
+                "rejected": self._rejected,
+            }
+        return {
+            **counters,
+            "wait_seconds": self._wait_latency.snapshot(),
+            "run_seconds": self._run_latency.snapshot(),
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+media_executor = MediaExecutor()
+frame_executor = MediaExecutor(max_workers=FRAME_WORKERS, max_queue=FRAME_MAX_QUEUE, timeout=FRAME_TIMEOUT, name="frame")
+
+
+def executors_metrics() -> Dict[str, Dict[str, Any]]:
+    """所有媒体线程池的指标, 按线程池名称索引"""
+    return {executor.name: executor.metrics() for executor in (media_executor, frame_executor)}
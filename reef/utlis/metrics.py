@@ -0,0 +1,39 @@
+import bisect
+import threading
+from typing import Dict, List, Sequence
+
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    """线程安全的累积直方图 (Prometheus 语义: bucket 为 <= le 的累计计数)"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative: List[int] = []
+        running = 0
+        for c in counts[:-1]:
+            running += c
+            cumulative.append(running)
+        return {
+            "buckets": dict(zip(self.buckets, cumulative)),
+            "sum": total,
+            "count": count,
+        }
@@ -9,6 +9,7 @@ from reef.core.deployments import DeploymentCore
 from reef.config import settings
 from reef.models.events import EventType
 from reef.core.events import EventLogger
+from reef.utlis._utils import update_document
 
 # 默认超时时间为60秒，如果配置文件中未设置
 GATEWAY_TIMEOUT = getattr(settings, 'GATEWAY_TIMEOUT', 60)
@@ -30,8 +31,7 @@ async def check_gateway_status():
             for gateway in online_gateways:
                 # 如果最后心跳时间超过阈值，将状态设置为离线
                 if gateway.last_heartbeat < timeout_threshold:
-                    gateway.status = GatewayStatus.OFFLINE
-                    await gateway.save()
+                    await update_document(gateway, {"status": GatewayStatus.OFFLINE})
                     logger.warning(f'网关: {gateway.id} 检测上报时间超限，设置下线!')
 
                     await EventLogger.log(
@@ -62,8 +62,7 @@ async def check_deployment_status():
                     if running_status == OperationStatus.RUNNING.value:
                         gateway = await GatewayModel.find_one(GatewayModel.id == deployment.gateway.id)
                         if gateway:
-                            gateway.status = GatewayStatus.ONLINE
-                            await gateway.save()
+                            await update_document(gateway, {"status": GatewayStatus.ONLINE})
                     logger.info(f'部署服务: {deployment.id} 状态为: {running_status.value}')
                 except Exception as e:
                     logger.warning(f'部署服务: {deployment.id} 状态检查失败: {str(e)}')
@@ -7,6 +7,7 @@ from inference_sdk import InferenceHTTPClient
 from inference_sdk.http.utils.requests import api_key_safe_raise_for_status
 
 from reef.config import settings
+from reef.utlis.instrumentation import instrumented
 
 class RemotePipelineStatus:
     SUCCESS = "success"
@@ -22,11 +23,13 @@ class PipelineClient:
         self.client = InferenceHTTPClient(api_url=api_url, api_key=api_key)
 
     @property
+    @instrumented("gateway")
     async def pipeline_ids(self) -> List[str]:
         response = await asyncify(self.client.list_inference_pipelines)()
         logger.debug(f'Remote Pipeline ids: {response}')
         return [p["pipeline_id"] for p in response['fixed_pipelines']]
 
+    @instrumented("gateway")
     async def create_pipeline(
         self,
         video_reference: Union[str, int, List[Union[str, int]]],
@@ -49,6 +52,7 @@ class PipelineClient:
         )
         return response['context']['pipeline_id']
     
+    @instrumented("gateway")
     async def pause_pipeline(self, pipeline_id: str) -> bool:
         if pipeline_id in await self.pipeline_ids:
             response = await asyncify(self.client.pause_inference_pipeline)(pipeline_id=pipeline_id) 
@@ -56,6 +60,7 @@ class PipelineClient:
             return state
         raise False
     
+    @instrumented("gateway")
     async def resume_pipeline(self, pipeline_id: str) -> bool:
         if pipeline_id in await self.pipeline_ids:
             response = await asyncify(self.client.resume_inference_pipeline)(pipeline_id=pipeline_id) 
@@ -64,9 +69,11 @@ class PipelineClient:
             return state
         raise False
     
+    @instrumented("gateway")
     async def terminate_pipeline(self, pipeline_id: str) -> None:
         await asyncify(self.client.terminate_inference_pipeline)(pipeline_id=pipeline_id)
     
+    @instrumented("gateway")
     async def offer_pipeline(self, pipeline_id: str, offer_request: Dict[str, Any]) -> None:
         def offer_inference_pipeline(pipeline_id: str, offer_request: Dict[str, Any], api_key: str) -> None:
             response = requests.post(
@@ -79,6 +86,7 @@ class PipelineClient:
         if pipeline_id in await self.pipeline_ids:
             return await asyncify(offer_inference_pipeline)(pipeline_id=pipeline_id, offer_request=offer_request, api_key=self.api_key)
 
+    @instrumented("gateway")
     async def get_pipeline_metrics(self, pipeline_id: str) -> str:
         if pipeline_id not in await self.pipeline_ids:
             return {"status": "timeout", "context": {"request_id": "", "pipeline_id": pipeline_id}, "report": None}
@@ -86,6 +94,7 @@ class PipelineClient:
         response = await asyncify(self.client.get_inference_pipeline_status)(pipeline_id=pipeline_id)
         return response
     
+    @instrumented("gateway")
     async def get_pipeline_metrics_timerange(
         self,
         pipeline_id: str,
@@ -120,6 +129,7 @@ class PipelineClient:
             api_key=self.api_key
         )
     
+    @instrumented("gateway")
     async def get_pipeline_results(
         self,
         pipeline_id: str,
@@ -131,6 +141,7 @@ class PipelineClient:
         )
         return response
 
+    @instrumented("gateway")
     async def capture_video_frame(self, video_source: Union[str, int]) -> Dict[str, Any]:
         """封装视频帧捕获接口"""
         def capture_video_frame_request(video_source: Union[str, int]) -> Dict[str, Any]:
@@ -144,6 +155,7 @@ class PipelineClient:
 
         return await asyncify(capture_video_frame_request)(video_source=video_source)
 
+    @instrumented("gateway")
     async def create_webrtc_video_stream(
         self,
         video_source: Union[str, int],
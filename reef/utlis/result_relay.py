@@ -0,0 +1,228 @@
+import time
+import uuid
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, FrozenSet, List, Literal, Optional, Tuple
+
+from loguru import logger
+
+from reef.config import settings
+from reef.utlis.pipeline import PipelineClient
+
+
+# 上游拉取间隔(秒)
+RELAY_INTERVAL = settings.get('result_relay_interval', 0.2)
+# 每个部署缓存的结果条数
+RELAY_BUFFER_SIZE = settings.get('result_relay_buffer', 100)
+# 没有任何读取后停止拉取的时间(秒)
+RELAY_IDLE_TIMEOUT = settings.get('result_relay_idle_timeout', 30)
+# 上游出错后的重试间隔(秒)
+RELAY_ERROR_BACKOFF = 2
+
+# 图像字段的返回方式: inline 内嵌 base64, ref 返回帧引用, none 不返回
+ImageMode = Literal["inline", "ref", "none"]
+
+
+def is_image_value(value: Any) -> bool:
+    """inference 输出的图像序列化为 {"type": "base64", "value": ...}"""
+    return isinstance(value, dict) and value.get("type") == "base64" and isinstance(value.get("value"), str)
+
+
+def frame_ref(epoch: str, seq: int, name: str, image: Dict[str, Any]) -> Dict[str, Any]:
+    """图像的帧引用, 通过 results/frames/{epoch}/{seq}/{name} 获取二进制图像
+
+    (epoch, seq) 唯一确定一帧, 引用的图像不会变化, 可以长期缓存。
+    """
+    ref = {key: value for key, value in image.items() if key != "value"}
+    ref.update({"type": "frame_ref", "frame": f"{epoch}/{seq}/{name}"})
+    return ref
+
+
+@dataclass
+class RelayItem:
+    epoch: str
+    seq: int
+    output: Dict[str, Any]
+    frame_metadata: Optional[Dict[str, Any]]
+    # 从 output 中拆出的图像字段, 按需内嵌或以帧引用返回
+    images: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # 已解码/缩放的图像: (字段, 宽度) -> JPEG 字节
+    encoded: Dict[Tuple[str, Optional[int]], bytes] = field(default_factory=dict, repr=False)
+
+    def filtered(self, exclude_fields: FrozenSet[str], image_mode: ImageMode = "inline") -> Dict[str, Any]:
+        output = self.output
+        if exclude_fields:
+            output = {key: value for key, value in output.items() if key not in exclude_fields}
+        if self.images and image_mode != "none":
+            output = dict(output)
+            for name, image in self.images.items():
+                if name in exclude_fields:
+                    continue
+                output[name] = image if image_mode == "inline" else frame_ref(self.epoch, self.seq, name, image)
+        return {"seq": self.seq, "output": output, "frame_metadata": self.frame_metadata}
+
+
+class ResultRelay:
+    """单个部署的推理结果中转
+
+    上游的 consume 接口是消费式的, 多个读者直接拉取会互相抢结果。
+    这里每个部署只有一个拉取任务, 结果写入有界环形缓冲区, 读者按序号增量读取。
+    exclude_fields 在服务端按读者过滤; 上游只排除所有活跃读者都不需要的字段。
+    超过 idle_timeout 没有读取时拉取任务自动停止。
+    epoch 标识一段连续的序号, 中转重建时沿用 epoch 和 last_seq, 只有进程重启等序号丢失时才变化。
+    """
+
+    def __init__(self, key: str, api_url: str, pipeline_id: str, image_fields: Optional[List[str]] = None,
+                 interval: float = RELAY_INTERVAL, buffer_size: int = RELAY_BUFFER_SIZE,
+                 idle_timeout: float = RELAY_IDLE_TIMEOUT, epoch: Optional[str] = None, last_seq: int = 0,
+                 on_stopped: Optional[Callable[["ResultRelay"], None]] = None):
+        self.key = key
+        self.pipeline_id = pipeline_id
+        self.epoch = epoch or uuid.uuid4().hex[:12]
+        self.image_fields = list(image_fields or [])
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.client = PipelineClient(api_url)
+        self.buffer: Deque[RelayItem] = deque(maxlen=buffer_size)
+        self.last_seq = last_seq
+        self._changed = asyncio.Condition()
+        # 读者的排除字段集合 -> 过期时间
+        self._leases: Dict[FrozenSet[str], float] = {}
+        self._task: Optional[asyncio.Task] = None
+        # 拉取任务退出后的回调, 由 ResultRelayManager 用于移除空闲的中转
+        self._on_stopped = on_stopped
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def touch(self, exclude_fields: FrozenSet[str] = frozenset()) -> None:
+        """记录一次读取, 必要时启动拉取任务"""
+        self._leases[exclude_fields] = time.monotonic() + self.idle_timeout
+        if not self.is_running:
+            self._task = asyncio.create_task(self._poll())
+
+    def _upstream_excludes(self) -> Optional[List[str]]:
+        now = time.monotonic()
+        self._leases = {fields: expires for fields, expires in self._leases.items() if expires > now}
+        if not self._leases:
+            return None
+        common = frozenset.intersection(*self._leases)
+        return sorted(common) or None
+
+    def since(self, seq: int, exclude_fields: FrozenSet[str] = frozenset(),
+              image_mode: ImageMode = "inline") -> List[Dict[str, Any]]:
+        """序号大于 seq 的缓存结果"""
+        return [item.filtered(exclude_fields, image_mode) for item in self.buffer if item.seq > seq]
+
+    def latest(self, exclude_fields: FrozenSet[str] = frozenset(),
+               image_mode: ImageMode = "inline") -> List[Dict[str, Any]]:
+        return [self.buffer[-1].filtered(exclude_fields, image_mode)] if self.buffer else []
+
+    def find(self, epoch: str, seq: int) -> Optional[RelayItem]:
+        """按 epoch 和序号查找缓存的结果, 已被挤出缓冲区或 epoch 不一致时返回 None"""
+        if epoch != self.epoch or not self.buffer or seq < self.buffer[0].seq or seq > self.buffer[-1].seq:
+            return None
+        item = self.buffer[seq - self.buffer[0].seq]
+        return item if item.seq == seq else next((item for item in self.buffer if item.seq == seq), None)
+
+    async def wait(self, seq: int, timeout: float) -> bool:
+        """等待出现序号大于 seq 的结果, 超时返回 False"""
+        async with self._changed:
+            try:
+                await asyncio.wait_for(self._changed.wait_for(lambda: self.last_seq > seq), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+    async def _poll(self) -> None:
+        logger.info(f"部署 {self.key} 开始中转推理结果")
+        try:
+            while self._leases and time.monotonic() < max(self._leases.values()):
+                try:
+                    response = await self.client.get_pipeline_results(self.pipeline_id, self._upstream_excludes())
+                except Exception as e:
+                    logger.warning(f"部署 {self.key} 拉取推理结果失败: {e}")
+                    await asyncio.sleep(RELAY_ERROR_BACKOFF)
+                    continue
+                await self._append(response)
+                await asyncio.sleep(self.interval)
+        finally:
+            # 空闲后释放缓存的结果(可能包含图像), 序号由 ResultRelayManager 保留以免读者重复读取
+            self.buffer.clear()
+            logger.info(f"部署 {self.key} 停止中转推理结果")
+            if self._on_stopped is not None:
+                self._on_stopped(self)
+
+    def stop(self) -> None:
+        self._leases.clear()
+        if self.is_running:
+            self._task.cancel()
+
+    async def _append(self, response: Dict[str, Any]) -> None:
+        outputs = (response or {}).get("outputs") or []
+        if not outputs:
+            return
+        frames_metadata = response.get("frames_metadata") or []
+        for index, output in enumerate(outputs):
+            self.last_seq += 1
+            metadata = frames_metadata[index] if index < len(frames_metadata) else None
+            self.buffer.append(self._split_images(self.last_seq, output, metadata))
+        await self._notify()
+
+    def _split_images(self, seq: int, output: Dict[str, Any], metadata: Optional[Dict[str, Any]]) -> RelayItem:
+        images = {name: output[name] for name in self.image_fields if is_image_value(output.get(name))}
+        if images:
+            output = {key: value for key, value in output.items() if key not in images}
+        return RelayItem(epoch=self.epoch, seq=seq, output=output, frame_metadata=metadata, images=images)
+
+    async def _notify(self) -> None:
+        async with self._changed:
+            self._changed.notify_all()
+
+
+class ResultRelayManager:
+    """按部署管理结果中转, 读取时按需创建"""
+
+    def __init__(self):
+        self._relays: Dict[str, ResultRelay] = {}
+        # 已移除的中转的 (epoch, last_seq), 重建时延续序号, 读者的 since 不会失效
+        self._sequences: Dict[str, Tuple[str, int]] = {}
+
+    def get(self, key: str, api_url: str, pipeline_id: str, image_fields: Optional[List[str]] = None) -> ResultRelay:
+        relay = self._relays.get(key)
+        # 管道重建后 pipeline_id 变化, 旧的中转作废
+        if relay is None or relay.pipeline_id != pipeline_id:
+            if relay is not None:
+                self._sequences[key] = (relay.epoch, relay.last_seq)
+                relay.stop()
+            epoch, last_seq = self._sequences.pop(key, (None, 0))
+            relay = ResultRelay(key, api_url, pipeline_id, image_fields, epoch=epoch, last_seq=last_seq,
+                                on_stopped=self._discard)
+            self._relays[key] = relay
+        elif image_fields is not None:
+            relay.image_fields = list(image_fields)
+        return relay
+
+    def remove(self, key: str) -> None:
+        """部署删除时停止并移除中转"""
+        self._sequences.pop(key, None)
+        relay = self._relays.pop(key, None)
+        if relay is not None:
+            relay.stop()
+
+    def _discard(self, relay: ResultRelay) -> None:
+        # 只移除仍在登记中的同一个中转, 已被新管道的中转替换时不处理
+        if self._relays.get(relay.key) is relay:
+            del self._relays[relay.key]
+            self._sequences[relay.key] = (relay.epoch, relay.last_seq)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            key: {"pipeline_id": relay.pipeline_id, "running": relay.is_running, "buffered": len(relay.buffer), "last_seq": relay.last_seq}
+            for key, relay in self._relays.items()
+        }
+
+
+result_relays = ResultRelayManager()
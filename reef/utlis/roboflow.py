@@ -1,28 +1,100 @@
+import os
+import time
+import asyncio
 import uuid
 import platform
 import json
+import hashlib
+import threading
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
 import requests
 from asyncer import asyncify
+from loguru import logger
 from inference_sdk.http.utils.aliases import resolve_roboflow_model_alias, REGISTERED_ALIASES
 
 from reef.config import settings
 from reef.exceptions import RemoteCallError
-from reef.utlis.cache import url_cache
 from reef.utlis._utils import _add_params_to_url
 from reef.utlis.cloud import backup_remote_url
+from reef.utlis.instrumentation import instrumented
 
 
-async def get_roboflow_worflows(workflow_id: str, project_id: str = None, api_key: str = None) -> List[Dict]:
+# (project, workflow, version, api_key 摘要)
+WorkflowCacheKey = Tuple[str, str, Optional[str], str]
+
+
+class RoboflowWorkflowCache:
+    """按 (project, workflow, version, api_key 摘要) 缓存 Roboflow 工作流配置
+
+    key 包含 api_key 的摘要, 不同(或无效)的 key 不会命中其他租户的缓存, 仍需经过 Roboflow 鉴权。
+
+    指定版本的配置不会变化，长期缓存；未指定版本(最新)的配置缓存 ttl 秒。
+    同一 key 的并发请求合并为一次拉取。
+    """
+
+    def __init__(self, ttl: float = 300, max_size: int = 256):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._cache: Dict[WorkflowCacheKey, Tuple[float, Dict]] = {}
+        self._inflight: Dict[WorkflowCacheKey, asyncio.Future] = {}
+
+    def get(self, key: WorkflowCacheKey) -> Optional[Dict]:
+        cached = self._cache.get(key)
+        if cached is None:
+            return None
+        expires_at, value = cached
+        if time.monotonic() >= expires_at:
+            self._cache.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: WorkflowCacheKey, value: Dict) -> None:
+        if len(self._cache) >= self.max_size:
+            # 淘汰最早写入的一项
+            self._cache.pop(next(iter(self._cache)), None)
+        expires_at = float('inf') if key[2] else time.monotonic() + self.ttl
+        self._cache[key] = (expires_at, value)
+
+    async def fetch(self, key: WorkflowCacheKey, loader) -> Dict:
+        value = self.get(key)
+        if value is not None:
+            return value
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        value = await asyncio.shield(task)
+        self.set(key, value)
+        return value
+
+
+workflow_cache = RoboflowWorkflowCache(ttl=settings.get('roboflow_workflow_cache_ttl', 300))
+
+
+async def get_roboflow_worflows(workflow_id: str, project_id: str = None, api_key: str = None, version: str = None) -> Dict:
     roboflow_url = settings.roboflow_api_url
     project_id = project_id or settings.roboflow_project_id
     roboflow_api_key = api_key or settings.roboflow_api_key
-    response = await asyncify(requests.get)(f"{roboflow_url}/{project_id}/workflows/{workflow_id}?api_key={roboflow_api_key}", timeout=60)
-    return response.json()['workflow']
 
+    @instrumented("roboflow", "get_workflow")
+    async def load() -> Dict:
+        params = [("api_key", roboflow_api_key)]
+        if version:
+            params.append(("workflow_version_id", version))
+        api_url = _add_params_to_url(f"{roboflow_url}/{project_id}/workflows/{workflow_id}", params)
+        response = await asyncify(requests.get)(api_url, timeout=60)
+        if response.status_code != 200:
+            raise RemoteCallError(f"Roboflow API返回错误: {response.status_code} {response.text}")
+        return response.json()['workflow']
 
+    key_digest = hashlib.sha256((roboflow_api_key or "").encode("utf-8")).hexdigest()
+    return await workflow_cache.fetch((project_id, workflow_id, version, key_digest), load)
+
+
+@instrumented("roboflow")
 async def get_roboflow_model_data(model_id: str, endpoint_type: str = None, device_id: str = None, api_key: str = None) -> dict:
     roboflow_url = settings.roboflow_api_url
     roboflow_api_key = api_key or settings.roboflow_api_key
@@ -69,22 +141,59 @@ async def get_models_type() -> List[str]:
     return sorted(list(set([model_id.split("-")[0] for model_id in list(REGISTERED_ALIASES.keys())])))
 
 
+class BlockDescribeIndex:
+    """describe.json 的内存索引
+
+    - blocks: manifest_type_identifier -> 区块描述
+    文件修改时间变化时自动重新加载, 为避免热路径频繁 stat, 最多每 check_interval 秒检查一次。
+    """
+
+    def __init__(self, path: Path, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.data: Optional[Dict] = None
+        self.blocks: Dict[str, Dict] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        if self.data is None:
+            return True
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        try:
+            return os.stat(self.path).st_mtime != self._mtime
+        except OSError:
+            return False
+
+    def reload(self) -> None:
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime
+            if self.data is not None and mtime == self._mtime:
+                return
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            blocks = {block['manifest_type_identifier']: block for block in data['blocks']}
+
+            # 整体替换，读取方不会看到半构建的索引
+            self.blocks, self.data = blocks, data
+            self._mtime = mtime
+            self._checked_at = time.monotonic()
+            logger.info(f'加载区块描述: {self.path}, 区块数: {len(blocks)}')
+
+    async def ensure_loaded(self) -> None:
+        if self.is_stale():
+            await asyncify(self.reload)()
+
+
+describe_index = BlockDescribeIndex(Path(__file__).parent.parent / 'statics' / 'describe.json')
+
+
 async def get_base_blocks_describe() -> Dict:
     """获取区块描述信息，包含翻译后的 schema"""
-    expires = 3600 * 24 * 30
-    # 读取 describe.json 文件
-    data = url_cache.get("base_blocks_describe", expires)
-    if not data:
-        describe_json_path = Path(__file__).parent.parent / 'statics' / 'describe.json'
-        with open(describe_json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        url_cache.set("base_blocks_describe", expires, data)
-    return data
-
-
-async def get_block_by_identifier(identifier: str) -> Dict:
-    data = await get_base_blocks_describe()
-    for block in data['blocks']:
-        if block['manifest_type_identifier'] == identifier:
-            return block
-    return None
+    await describe_index.ensure_loaded()
+    return describe_index.data
@@ -0,0 +1,89 @@
+"""JSON 序列化 (orjson)"""
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import orjson
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from reef.config import settings
+
+
+# 预序列化缓存的最大条目数
+SERIALIZED_CACHE_SIZE = settings.get('serialized_cache_size', 128)
+
+
+def _default(value: Any) -> Any:
+    # datetime/ObjectId/Enum/pydantic 模型等非 JSON 原生类型
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode='json')
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'value'):
+        return value.value
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    """序列化为 UTF-8 JSON 字节"""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+@dataclass
+class SerializedPayload:
+    etag: str
+    body: bytes
+
+
+class SerializedCache:
+    """预序列化 JSON 的 LRU 缓存
+
+    用于只随版本变化的资源(工作流详情等), key 必须包含版本信息(如 ETag),
+    版本变化后旧条目不再命中, 随 LRU 淘汰。
+    """
+
+    def __init__(self, maxsize: int = SERIALIZED_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, SerializedPayload]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[SerializedPayload]:
+        payload = self._entries.get(key)
+        if payload is not None:
+            self._entries.move_to_end(key)
+        return payload
+
+    def put(self, key: Hashable, content: Any, etag: Optional[str] = None) -> SerializedPayload:
+        body = dumps(content)
+        payload = SerializedPayload(etag=etag or hashlib.md5(body).hexdigest(), body=body)
+        self._entries[key] = payload
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return payload
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Any], etag: Optional[str] = None) -> SerializedPayload:
+        payload = self.get(key)
+        return payload if payload is not None else self.put(key, build(), etag)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def payload_response(request: Request, payload: SerializedPayload, headers: Optional[Dict[str, str]] = None) -> Response:
+    """返回预序列化的 JSON, 带 ETag, If-None-Match 命中时返回 304"""
+    etag = f'"{payload.etag}"'
+    headers = {**(headers or {}), "ETag": etag}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
@@ -0,0 +1,294 @@
+import time
+import asyncio
+import base64
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from reef.config import settings
+from reef.exceptions import RemoteCallError
+from reef.utlis.cloud import sign_url
+from reef.utlis.pipeline import PipelineClient
+from reef.utlis.media import media_executor
+from reef.models.cameras import CameraModel, CameraType
+
+
+# 实时流快照的缓存时间(秒)，相机网格页同时请求时共享同一次取帧
+SNAPSHOT_TTL = settings.get('snapshot_ttl', 5)
+# 文件视频的快照总是首帧，可以缓存更久
+FILE_SNAPSHOT_TTL = settings.get('file_snapshot_ttl', 3600)
+# 常驻取流刷新快照的间隔(秒)
+WARM_INTERVAL = settings.get('snapshot_warm_interval', 2)
+# 常驻取流的最大相机数
+MAX_WARM_CAMERAS = settings.get('snapshot_max_warm', 16)
+JPEG_QUALITY = 95
+THUMBNAIL_QUALITY = settings.get('thumbnail_quality', 80)
+# 缩略图宽度档位, 请求的宽度向上取整到档位, 每个相机最多缓存这几种尺寸
+THUMBNAIL_WIDTHS = sorted(settings.get('thumbnail_widths', [160, 320, 480, 640, 960, 1280, 1920]))
+
+
+def read_frame(cap: cv2.VideoCapture, retries: int = 5) -> Optional[np.ndarray]:
+    """从已打开的视频源读取一帧，失败时最多重试 retries 次"""
+    for _ in range(retries):
+        ret, frame = cap.read()
+        if ret and frame is not None:
+            return frame
+    return None
+
+
+def encode_jpeg(frame: np.ndarray, quality: int = JPEG_QUALITY) -> bytes:
+    """将帧编码为JPEG"""
+    success, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not success:
+        raise RemoteCallError("无法编码图片为JPEG格式")
+    return buffer.tobytes()
+
+
+def thumbnail_width(width: int) -> int:
+    """将请求的宽度向上取整到缩略图档位, 超过最大档位时取最大档位"""
+    return next((bucket for bucket in THUMBNAIL_WIDTHS if bucket >= width), THUMBNAIL_WIDTHS[-1])
+
+
+def resize_jpeg(image: bytes, width: int, quality: int = THUMBNAIL_QUALITY) -> Tuple[bytes, int, int]:
+    """将JPEG缩放到指定宽度(保持宽高比，只缩小不放大)并重新编码"""
+    frame = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise RemoteCallError("无法解码快照图片")
+    h, w = frame.shape[:2]
+    if width < w:
+        height = max(1, round(h * width / w))
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    return encode_jpeg(frame, quality), frame.shape[1], frame.shape[0]
+
+
+def capture_jpeg(path: str) -> bytes:
+    """打开视频源读取一帧并编码为JPEG (阻塞调用，需在线程池中执行)"""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise RemoteCallError("无法打开视频源")
+        frame = read_frame(cap)
+        if frame is None:
+            raise RemoteCallError("无法读取帧")
+        return encode_jpeg(frame)
+    finally:
+        cap.release()
+
+
+class WarmCapture:
+    """常驻取流：保持视频源连接，持续 grab 保证缓冲区最新，定期解码并写入快照缓存"""
+
+    def __init__(self, camera: CameraModel, service: 'SnapshotService', interval: float = WARM_INTERVAL):
+        self.camera_id = str(camera.id)
+        self.path = str(camera.path)
+        self.service = service
+        self.interval = interval
+        self.is_running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.info(f"相机 {self.camera_id} 开启常驻取流")
+
+    def stop(self):
+        self.is_running = False
+
+    def _run(self):
+        cap = None
+        next_refresh = 0.0
+        while self.is_running:
+            if cap is None or not cap.isOpened():
+                cap = cv2.VideoCapture(self.path)
+                if not cap.isOpened():
+                    logger.warning(f"相机 {self.camera_id} 常驻取流打开失败，稍后重试")
+                    cap.release()
+                    cap = None
+                    time.sleep(self.interval)
+                    continue
+            try:
+                if not cap.grab():
+                    # 能打开但读不到帧的流同样退避重连, 避免空转占满 CPU
+                    cap.release()
+                    cap = None
+                    time.sleep(self.interval)
+                    continue
+                if time.monotonic() < next_refresh:
+                    continue
+                ret, frame = cap.retrieve()
+                if ret and frame is not None:
+                    self.service.set_cache(self.camera_id, encode_jpeg(frame), SNAPSHOT_TTL)
+                    next_refresh = time.monotonic() + self.interval
+            except Exception as e:
+                logger.warning(f"相机 {self.camera_id} 常驻取流异常: {e}")
+                time.sleep(self.interval)
+        if cap is not None:
+            cap.release()
+        logger.info(f"相机 {self.camera_id} 关闭常驻取流")
+
+
+@dataclass
+class Snapshot:
+    image: bytes
+    taken_at: float
+    expires_at: float
+
+
+@dataclass
+class Thumbnail:
+    camera_id: str
+    image: bytes
+    width: int
+    height: int
+    etag: str
+    taken_at: float
+
+
+class SnapshotService:
+    """相机快照服务
+
+    - 按相机缓存编码后的JPEG，TTL 内直接返回
+    - 同一相机的并发请求合并为一次取帧
+    - 阻塞的 cv2 调用在媒体线程池中执行
+    - 常驻取流(keep warm)的相机由后台线程持续刷新缓存
+    """
+
+    def __init__(self):
+        self._cache: Dict[str, Snapshot] = {}
+        self._thumbnails: Dict[Tuple[str, int], Thumbnail] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._warm: Dict[str, WarmCapture] = {}
+
+    def get_cache(self, camera_id: str) -> Optional[Snapshot]:
+        snapshot = self._cache.get(camera_id)
+        if snapshot is None:
+            return None
+        if time.time() >= snapshot.expires_at:
+            self._cache.pop(camera_id, None)
+            return None
+        return snapshot
+
+    def set_cache(self, camera_id: str, image: bytes, ttl: float) -> Snapshot:
+        now = time.time()
+        snapshot = Snapshot(image=image, taken_at=now, expires_at=now + ttl)
+        self._cache[camera_id] = snapshot
+        return snapshot
+
+    def invalidate(self, camera_id: str) -> None:
+        self._cache.pop(camera_id, None)
+        for key in [key for key in self._thumbnails if key[0] == camera_id]:
+            self._thumbnails.pop(key, None)
+
+    async def fetch(self, camera: CameraModel) -> Snapshot:
+        """获取相机快照(含取帧时间)"""
+        camera_id = str(camera.id)
+        snapshot = self.get_cache(camera_id)
+        if snapshot is not None:
+            return snapshot
+
+        task = self._inflight.get(camera_id)
+        if task is None:
+            task = asyncio.ensure_future(self._grab(camera))
+            self._inflight[camera_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(camera_id, None))
+        # shield: 单个请求取消不影响其他等待同一次取帧的请求
+        return await asyncio.shield(task)
+
+    async def get_snapshot(self, camera: CameraModel) -> bytes:
+        """获取相机快照的JPEG数据"""
+        snapshot = await self.fetch(camera)
+        return snapshot.image
+
+    async def get_thumbnail(self, camera: CameraModel, width: int) -> Thumbnail:
+        """获取指定宽度的缩略图，宽度按档位取整，同一快照的同一档位只缩放一次"""
+        camera_id = str(camera.id)
+        width = thumbnail_width(width)
+        snapshot = await self.fetch(camera)
+        key = (camera_id, width)
+        thumbnail = self._thumbnails.get(key)
+        if thumbnail is not None and thumbnail.taken_at == snapshot.taken_at:
+            return thumbnail
+
+        image, thumb_width, thumb_height = await media_executor.run(resize_jpeg, snapshot.image, width)
+        thumbnail = Thumbnail(
+            camera_id=camera_id,
+            image=image,
+            width=thumb_width,
+            height=thumb_height,
+            etag=hashlib.md5(image).hexdigest(),
+            taken_at=snapshot.taken_at,
+        )
+        self._thumbnails[key] = thumbnail
+        return thumbnail
+
+    async def _grab(self, camera: CameraModel) -> Snapshot:
+        try:
+            # 有网关的 USB 摄像头由网关取帧
+            if camera.gateway and camera.type == CameraType.USB:
+                pipeline_client = PipelineClient(api_url=camera.gateway.get_api_url())
+                result = await pipeline_client.capture_video_frame(video_source=camera.path)
+                if result.get('status') != 'success':
+                    raise RemoteCallError(f"获取视频帧失败: {result.get('error')}")
+                image = base64.b64decode(result['image_base64'])
+            else:
+                path = await sign_url(camera.path) if camera.type == CameraType.FILE else str(camera.path)
+                try:
+                    image = await media_executor.run(capture_jpeg, path)
+                except RemoteCallError as e:
+                    raise RemoteCallError(f"获取视频帧失败: {e.message}")
+        except RemoteCallError:
+            raise
+        except Exception as e:
+            raise RemoteCallError(f"获取视频帧失败: {e}")
+
+        ttl = FILE_SNAPSHOT_TTL if camera.type == CameraType.FILE else SNAPSHOT_TTL
+        return self.set_cache(str(camera.id), image, ttl)
+
+    def is_pinned(self, camera_id: str) -> bool:
+        return camera_id in self._warm
+
+    @staticmethod
+    def supports_warm(camera: CameraModel) -> bool:
+        """文件视频和网关 USB 摄像头不需要常驻取流"""
+        return not (camera.type == CameraType.FILE or (camera.gateway and camera.type == CameraType.USB))
+
+    def pin(self, camera: CameraModel) -> bool:
+        """开启相机常驻取流"""
+        camera_id = str(camera.id)
+        if camera_id in self._warm:
+            return True
+        if not self.supports_warm(camera):
+            return False
+        if len(self._warm) >= MAX_WARM_CAMERAS:
+            logger.warning(f"常驻取流相机数已达上限 {MAX_WARM_CAMERAS}, 相机 {camera_id} 不开启常驻")
+            return False
+        warm = WarmCapture(camera, self)
+        self._warm[camera_id] = warm
+        warm.start()
+        return True
+
+    def unpin(self, camera_id: str) -> None:
+        warm = self._warm.pop(camera_id, None)
+        if warm:
+            warm.stop()
+
+    async def start_keep_warm(self) -> None:
+        """启动所有标记为常驻取流的相机"""
+        cameras = await CameraModel.find(CameraModel.keep_warm == True, fetch_links=True).to_list()
+        for camera in cameras:
+            self.pin(camera)
+
+    def shutdown(self) -> None:
+        for camera_id in list(self._warm):
+            self.unpin(camera_id)
+
+
+snapshot_service = SnapshotService()
@@ -1,6 +1,7 @@
+import time
 import asyncio
 import threading
-from typing import Optional
+from typing import Optional, Tuple
 from threading import Event
 from fractions import Fraction
 
@@ -19,18 +20,40 @@ from av import logging as av_logging
 
 from reef.exceptions import RemoteCallError
 from reef.utlis.cloud import sign_url_sync
+from reef.utlis.media import frame_executor, media_executor
 from reef.models.cameras import CameraModel, CameraType
 from reef.schemas.cameras import CameraWebRTCStreamRequest, CameraWebRTCStreamResponse
 
 
+VIDEO_CLOCK_RATE = 90000
+VIDEO_TIME_BASE = Fraction(1, VIDEO_CLOCK_RATE)
+
+
+def _waiting_frame() -> VideoFrame:
+    """创建等待视频流的默认黑色帧"""
+    default_frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    cv2.putText(default_frame, "等待视频流...", (10, 240), 
+               cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    return VideoFrame.from_ndarray(default_frame, format="bgr24")
+
+
 class CV2VideoSource:
-    """基于CV2的视频源，支持不同类型的摄像头"""
-    
-    def __init__(self, camera: CameraModel):
+    """基于CV2的视频源，支持不同类型的摄像头
+
+    读取在独立线程中进行，只保留最新一帧（单槽交接），消费者较慢时中间帧会被直接丢弃。
+    start 会阻塞打开视频源，需通过媒体线程池调用；常驻读取线程不占用媒体线程池。
+    """
+
+    def __init__(self, camera: CameraModel, width: Optional[int] = None, height: Optional[int] = None):
         self.camera = camera
+        self.width = width
+        self.height = height
         self.cap: Optional[cv2.VideoCapture] = None
         self.is_running = False
+        self._reader: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
         self._last_frame: Optional[np.ndarray] = None
+        self._frame_seq = 0
     
     def _get_video_path(self) -> str:
         """获取视频路径"""
@@ -52,6 +75,8 @@ class CV2VideoSource:
                 raise ValueError(f"无法打开视频源: {path}")
             
             self.is_running = True
+            self._reader = threading.Thread(target=self._read_loop, daemon=True)
+            self._reader.start()
             logger.info(f"视频源启动成功: {path}")
             
         except Exception as e:
@@ -59,28 +84,65 @@ class CV2VideoSource:
             raise
     
     def stop(self):
-        """停止视频源"""
+        """停止视频源，读取线程退出时负责释放 cap，避免在读取过程中释放"""
         self.is_running = False
-        if self.cap:
+        if self._reader is None and self.cap:
             self.cap.release()
             self.cap = None
-    
-    def get_frame(self) -> Optional[np.ndarray]:
-        """获取视频帧"""
-        if not self.is_running or not self.cap:
-            return None
-        
+
+    def _resize(self, frame: np.ndarray) -> np.ndarray:
+        """按请求分辨率缩小帧（每一边都只缩小不放大，缺省一边时保持宽高比）"""
+        if not self.width and not self.height:
+            return frame
+        h, w = frame.shape[:2]
+        width, height = self.width, self.height
+        if not width:
+            width = int(w * height / h)
+        elif not height:
+            height = int(h * width / w)
+        width, height = min(width, w), min(height, h)
+        if width == w and height == h:
+            return frame
+        return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+    def _read_loop(self):
+        """读取线程：持续读取帧并覆盖最新帧槽位"""
+        cap = self.cap
+        # 文件源 read() 不会阻塞，需要按源帧率节流，避免空转解码
+        source_fps = cap.get(cv2.CAP_PROP_FPS) if self.camera.type == CameraType.FILE else 0
+        interval = 1.0 / source_fps if source_fps and source_fps > 0 else 0
+        next_ts = time.monotonic()
         try:
-            ret, frame = self.cap.read()
-            if ret and frame is not None:
-                self._last_frame = frame.copy()
-                return frame
-            else:
-                # 如果读取失败，返回上一帧
-                return self._last_frame
-        except Exception as e:
-            logger.error(f"读取视频帧失败: {e}")
-            return self._last_frame
+            while self.is_running:
+                try:
+                    ret, frame = cap.read()
+                except Exception as e:
+                    logger.error(f"读取视频帧失败: {e}")
+                    ret, frame = False, None
+                if not ret or frame is None:
+                    # 读取失败时保留上一帧，稍后重试
+                    time.sleep(0.1)
+                    continue
+                frame = self._resize(frame)
+                with self._lock:
+                    self._last_frame = frame
+                    self._frame_seq += 1
+                if interval:
+                    next_ts += interval
+                    delay = next_ts - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_ts = time.monotonic()
+        finally:
+            cap.release()
+            self.cap = None
+            self._reader = None
+
+    def get_frame(self) -> Tuple[Optional[np.ndarray], int]:
+        """获取最新视频帧及其序号，不阻塞"""
+        with self._lock:
+            return self._last_frame, self._frame_seq
     
     def get_last_frame(self) -> Optional[np.ndarray]:
         """获取最后一帧"""
@@ -88,13 +150,15 @@ class CV2VideoSource:
 
 
 class WebRTCVideoTrack(VideoStreamTrack):
-    """WebRTC视频轨道，从CV2视频源获取帧"""
+    """WebRTC视频轨道，从CV2视频源获取帧，按墙钟时间节拍输出"""
     
     def __init__(self, video_source: CV2VideoSource, fps: float = 30):
         super().__init__()
         self.video_source = video_source
-        self.fps = int(fps)
-        self._processed = 0
+        self.fps = float(fps) if fps and fps > 0 else 30.0
+        self._start: Optional[float] = None
+        self._next_ts: Optional[float] = None
+        self._last_seq = -1
         self._last_frame: Optional[VideoFrame] = None
         self._av_logging_set = False
         self._active = True
@@ -103,6 +167,22 @@ class WebRTCVideoTrack(VideoStreamTrack):
         """关闭视频轨道"""
         self._active = False
         self.video_source.stop()
+
+    async def _wait_next_tick(self) -> int:
+        """等待下一个发送时刻，返回基于墙钟的 pts"""
+        interval = 1.0 / self.fps
+        now = time.monotonic()
+        if self._start is None:
+            self._start = self._next_ts = now
+        else:
+            self._next_ts += interval
+            delay = self._next_ts - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif -delay > interval:
+                # 消费者落后超过一帧，不追赶补发，直接从当前时刻重新计时
+                self._next_ts = now
+        return int((self._next_ts - self._start) * VIDEO_CLOCK_RATE)
     
     async def recv(self):
         """接收视频帧"""
@@ -114,34 +194,34 @@ class WebRTCVideoTrack(VideoStreamTrack):
         if not self._active:
             raise Exception("视频轨道已关闭")
         
-        self._processed += 1
+        pts = await self._wait_next_tick()
         
         # 获取视频帧
-        np_frame = self.video_source.get_frame()
+        np_frame, seq = self.video_source.get_frame()
         
         if np_frame is None:
             # 如果没有新帧，使用上一帧或创建默认帧
             if self._last_frame:
                 new_frame = self._last_frame
             else:
-                # 创建默认黑色帧
-                default_frame = np.zeros((480, 640, 3), dtype=np.uint8)
-                cv2.putText(default_frame, "等待视频流...", (10, 240), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-                new_frame = VideoFrame.from_ndarray(default_frame, format="bgr24")
+                new_frame = await frame_executor.run(_waiting_frame)
+        elif seq == self._last_seq and self._last_frame:
+            # 源帧未更新，复用已转换的帧
+            new_frame = self._last_frame
         else:
-            # 转换为VideoFrame
-            new_frame = VideoFrame.from_ndarray(np_frame, format="bgr24")
-            self._last_frame = new_frame
+            # 转换为VideoFrame，转换失败时复用上一帧
+            try:
+                new_frame = await frame_executor.run(VideoFrame.from_ndarray, np_frame, format="bgr24")
+                self._last_frame = new_frame
+                self._last_seq = seq
+            except RemoteCallError as e:
+                if not self._last_frame:
+                    raise
+                logger.warning(f"视频帧转换失败，复用上一帧: {e}")
+                new_frame = self._last_frame
         
-        # 设置时间戳
-        try:
-            new_frame.pts = self._processed
-            new_frame.time_base = Fraction(1, self.fps)
-        except Exception as e:
-            logger.error(f'设置帧时间失败: {e}')
-            new_frame.pts = self._processed
-            new_frame.time_base = Fraction(1, 30)
+        new_frame.pts = pts
+        new_frame.time_base = VIDEO_TIME_BASE
         
         return new_frame
 
@@ -179,8 +259,9 @@ class WebRTCManager:
     async def _create_peer_connection(self, config: CameraWebRTCStreamRequest, camera: CameraModel) -> WebRTCPeerConnection:
         """创建对等连接"""
         # 创建视频源
-        self.video_source = CV2VideoSource(camera)
-        self.video_source.start()
+        self.video_source = CV2VideoSource(camera, width=config.width, height=config.height)
+        # 打开视频源可能阻塞数秒(RTSP 握手/远程文件)，在媒体线程池中执行
+        await media_executor.run(self.video_source.start)
         
         # 创建视频轨道
         self.video_track = WebRTCVideoTrack(self.video_source, config.fps)
@@ -234,6 +315,8 @@ class WebRTCManager:
         """创建WebRTC连接"""
         try:
             logger.info("开始创建WebRTC连接")
+            if isinstance(config, dict):
+                config = CameraWebRTCStreamRequest(**config)
             
             # 创建新的异步事件循环和线程
             self.loop = asyncio.new_event_loop()
@@ -0,0 +1,119 @@
+"""将工作流 specification 转换为前端画布数据(nodes/edges)"""
+import re
+import copy
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from reef.templates.workflow_nodes import INPUT_NODE_TEMPLATE, STEP_NODE_TEMPLATE, OUTPUT_NODE_TEMPLATE
+
+
+# 匹配 $steps.step_name.property 格式，只捕获步骤名
+STEP_SELECTOR_PATTERN = re.compile(r'\$steps\.([^.\s\[\]]+)')
+INPUT_SELECTOR_PREFIX = '$inputs.'
+# 不参与依赖分析的字段
+_SKIP_FIELDS = ('name', 'type')
+
+
+def scan_step(step: Dict) -> Tuple[Set[str], bool]:
+    """单次遍历步骤的所有字段，返回 (依赖的步骤名集合, 是否依赖输入)"""
+    dependencies: Set[str] = set()
+    has_input = False
+    stack = [value for key, value in step.items() if key not in _SKIP_FIELDS]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            if '$steps.' in value:
+                dependencies.update(STEP_SELECTOR_PATTERN.findall(value))
+            if not has_input and INPUT_SELECTOR_PREFIX in value:
+                has_input = True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return dependencies, has_input
+
+
+def _edge(source: str, target: str) -> Dict:
+    return {
+        "source": source,
+        "target": target,
+        "id": f"reactflow__edge-{source}-{target}"
+    }
+
+
+def _step_node(node_id: str, index: int, block: Optional[Dict], step: Dict) -> Dict:
+    data = dict(block) if block is not None else {}
+    data["formData"] = step
+    return {
+        **STEP_NODE_TEMPLATE,
+        "id": node_id,
+        "position": {"x": 160 + index * 200, "y": 120 + index * 100},
+        "data": data,
+        "style": dict(STEP_NODE_TEMPLATE["style"]),
+        "positionAbsolute": dict(STEP_NODE_TEMPLATE["positionAbsolute"]),
+    }
+
+
+def build_workflow_data(
+    inputs: List[Dict],
+    steps: List[Dict],
+    outputs: List[Dict],
+    get_block: Callable[[str], Optional[Dict]],
+) -> Dict:
+    """构建画布数据
+
+    每个步骤只遍历一次得到依赖索引，连线和输出节点复用该索引。
+    每个节点只连接最近的上游节点；没有步骤依赖时连接输入节点或前一个步骤。
+    """
+    input_node = copy.deepcopy(INPUT_NODE_TEMPLATE)
+    input_node["data"]["formData"]["sources"] = [{"name": "image"}]
+    input_node["data"]["formData"]["params"] = [
+        {"name": item['name'], "value": item['default_value']}
+        for item in inputs if item['type'] == 'WorkflowParameter'
+    ]
+    nodes = [input_node]
+    edges = []
+
+    step_name_to_index = {step['name']: i for i, step in enumerate(steps)}
+    node_ids = [f"{step['type']}-{i}" for i, step in enumerate(steps)]
+    steps_with_downstream: Set[str] = set()
+
+    for i, step in enumerate(steps):
+        node_id = node_ids[i]
+        nodes.append(_step_node(node_id, i, get_block(step['type']), step))
+
+        dependencies, has_input = scan_step(step)
+        steps_with_downstream.update(dependencies)
+
+        # 找到最近的上游节点(索引最大的依赖)
+        upstream = max((step_name_to_index[name] for name in dependencies if name in step_name_to_index), default=-1)
+        if upstream >= 0:
+            edges.append(_edge(node_ids[upstream], node_id))
+        elif has_input or i == 0:
+            edges.append(_edge("input-node", node_id))
+        else:
+            # 没有任何依赖，连接到前一个步骤（保持线性）
+            edges.append(_edge(node_ids[i - 1], node_id))
+
+    output_node = copy.deepcopy(OUTPUT_NODE_TEMPLATE)
+    output_node["data"]["formData"]["params"] = [{
+        "name": output["name"],
+        "selector": output["selector"],
+        "value": output["selector"]
+    } for output in outputs]
+    nodes.append(output_node)
+
+    # 只连接输出依赖中没有下游节点的步骤
+    output_dependencies = []
+    for output in outputs:
+        if output["selector"].startswith("$steps."):
+            step_name = output["selector"].split(".")[1]
+            if step_name in step_name_to_index and step_name not in output_dependencies:
+                output_dependencies.append(step_name)
+    for step_name in output_dependencies:
+        if step_name not in steps_with_downstream:
+            edges.append(_edge(node_ids[step_name_to_index[step_name]], "output-node"))
+
+    return {
+        "nodes": nodes,
+        "edges": edges
+    }